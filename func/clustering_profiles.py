@@ -1,16 +1,131 @@
-import collections
 import logging
 
+import numpy as np
 import pandas as pd
+import scipy.sparse
 
 # importing the case generation function
-from func.event_log import case_id
+from func.event_log import case_ids
 
 # pd settings
 pd.options.mode.chained_assignment = None
 
 
-def profile_activity(log_pd=pd.DataFrame):
+def case_codes(log_pd=pd.DataFrame):
+    """Encodes the cases of an event log as integers, in the
+    sorted order used by a groupby on the case id
+
+    Args:
+        log_pd: an event log in a pandas dataframe
+
+    Returns:
+        The integer code of every event (-1 for missing case ids)
+        and the case ids of the codes
+    """
+    codes, cases = log_pd["case:concept:name"].factorize(sort=True)
+    return codes, np.asarray(cases)
+
+
+def count_codes(codes, cases, value_codes, names, sparse=False):
+    """Counts how many times every value code appears inside every
+    case code
+
+    Args:
+        codes: the integer case code of every event (see case_codes)
+        cases: the case ids of the codes
+        value_codes: the integer value code of every event
+        names: the values of the value codes
+        sparse: a boolean value that tells if the counts should be
+                kept in a scipy CSR matrix, so the memory scales with
+                the non-zero counts. The value columns of the profile
+                are then pandas sparse columns. Prefilled with False
+
+    Returns:
+        A pandas dataframe with one row per case and one column
+        per value, followed by the case id column
+    """
+    # missing cases or values are not counted
+    mask = (codes >= 0) & (value_codes >= 0)
+
+    if sparse:
+        # duplicate (case, value) pairs get summed up by the CSR conversion
+        counts = scipy.sparse.csr_matrix(
+            (
+                np.ones(np.count_nonzero(mask), dtype=np.int64),
+                (codes[mask], value_codes[mask]),
+            ),
+            shape=(len(cases), len(names)),
+        )
+        profile = pd.DataFrame.sparse.from_spmatrix(counts, columns=pd.Index(names))
+    else:
+        counts = np.bincount(
+            codes[mask].astype(np.int64) * len(names) + value_codes[mask],
+            minlength=len(cases) * len(names),
+        ).reshape(len(cases), len(names))
+        profile = pd.DataFrame(counts, columns=pd.Index(names))
+
+    profile["case:concept:name"] = cases
+
+    return profile
+
+
+def count_profile(codes, cases, values, sparse=False):
+    """Counts how many times every value appears inside every case,
+    on integer codes instead of per-case lists
+
+    Args:
+        codes: the integer case code of every event (see case_codes)
+        cases: the case ids of the codes
+        values: a pd series with the value of every event
+        sparse: a boolean value that tells if the counts should be
+                kept sparse (see count_codes). Prefilled with False
+
+    Returns:
+        A pandas dataframe with one row per case and one column
+        per value (sorted), followed by the case id column
+    """
+    value_codes, names = values.factorize(sort=True)
+
+    return count_codes(codes, cases, value_codes, np.asarray(names), sparse=sparse)
+
+
+def used_codes(codes, size):
+    """Renumbers integer codes so that only the used ones are kept,
+    in the same order
+
+    Args:
+        codes: a numpy array of non-negative codes
+        size: the number of possible codes
+
+    Returns:
+        The renumbered codes and a boolean mask of the used codes
+    """
+    used = np.bincount(codes, minlength=size) > 0
+    return (np.cumsum(used) - 1)[codes], used
+
+
+def site_lookup(vle=pd.DataFrame):
+    """Builds a dense lookup array from the id of a vle page to
+    the code of its activity type
+
+    Args:
+        vle: a pd dataframe with the site and activity_type of
+             every vle page
+
+    Returns:
+        The lookup array (-1 for unknown sites) and the activity
+        types (sorted) of the codes
+    """
+    sites = pd.to_numeric(vle["site"]).to_numpy(dtype=np.int64)
+    type_codes, types = vle["activity_type"].factorize(sort=True)
+
+    lookup = np.full(sites.max() + 1 if len(sites) else 0, -1, dtype=np.int64)
+    lookup[sites] = type_codes
+
+    return lookup, np.asarray(types)
+
+
+def profile_activity(log_pd=pd.DataFrame, sparse=False, codes=None):
     """This function creates the activities profiles used in
     clustering.
 
@@ -19,8 +134,16 @@ def profile_activity(log_pd=pd.DataFrame):
     the methodology developed in "Trace Clustering in
     Process Mining" by Song et all
 
+    The (case, activity) pairs are counted on integer codes.
+    The rows are sorted by case and the columns by activity,
+    with the case id as the last column
+
     Args:
         log_pd: an event log in a pandas dataframe
+        sparse: a boolean value that tells if the counts should be
+                kept sparse (see count_profile). Prefilled with False
+        codes: the case codes and case ids of the log (see
+               case_codes), computed if not given
 
     Returns: A pandas dataframe with the activity profile
 
@@ -31,27 +154,31 @@ def profile_activity(log_pd=pd.DataFrame):
 
     logger.info("Activity Profile is getting created")
 
-    activity_profile = log_pd.groupby("case:concept:name")["concept:name"].apply(list)
-    activity_profile = activity_profile.reset_index()
-
-    dummy = list(
-        activity_profile["concept:name"].apply(lambda x: collections.Counter(x))
+    codes, cases = case_codes(log_pd) if codes is None else codes
+    activity_profile = count_profile(
+        codes, cases, log_pd["concept:name"], sparse=sparse
     )
-    dummy = pd.DataFrame(dummy)
-    dummy["case:concept:name"] = activity_profile["case:concept:name"]
-    activity_profile = dummy
-
-    activity_profile = activity_profile.fillna(0)
 
     logger.debug("Length of activity profile is %s", len(activity_profile))
-    logger.debug("Mean of activities is %s", activity_profile.mean(axis=0))
+    logger.debug(
+        "Mean of activities is %s", activity_profile.mean(axis=0, numeric_only=True)
+    )
 
     logger.info("Activity Profile is created")
 
     return activity_profile
 
 
-def profile_performance(log_pd=pd.DataFrame):
+# features of the performance profile, the last two are optional
+PERFORMANCE_FEATURES = ["duration", "events", "mean_gap", "active_days"]
+
+# nanoseconds in a day
+DAY = 86400 * 10**9
+
+
+def profile_performance(
+    log_pd=pd.DataFrame, features=("duration", "events"), codes=None
+):
     """This function creates the performance profiles used in
     clustering.
 
@@ -61,7 +188,19 @@ def profile_performance(log_pd=pd.DataFrame):
     the methodology developed in "Trace Clustering in
     Process Mining" by Song et all
 
-    Args: log_pd: an event log in a pandas dataframe
+    The first and last timestamps and the number of events come
+    from one grouped min/max/size over the int64 timestamps, so
+    the order of the events inside a case does not matter
+
+    Args:
+        log_pd: an event log in a pandas dataframe
+        features: the features to be computed (see
+                  PERFORMANCE_FEATURES). Besides the duration in days
+                  and the number of events, "mean_gap" gives the mean
+                  time between two events in days and "active_days"
+                  the number of days with events
+        codes: the case codes and case ids of the log (see
+               case_codes), computed if not given
 
     Returns: A pandas dataframe with the performance profile
 
@@ -71,21 +210,42 @@ def profile_performance(log_pd=pd.DataFrame):
 
     logger.info("Performance Profile is getting created")
 
-    perf_profile = log_pd.groupby("case:concept:name")["time:timestamp"].apply(list)
-    perf_profile = perf_profile.reset_index()
-
-    # total case duration
-    perf_profile["duration"] = perf_profile["time:timestamp"].apply(
-        lambda x: (x[-1] - x[0]).days
-    )
-    # number of events
-    perf_profile["events"] = perf_profile["time:timestamp"].apply(lambda x: len(x))
-
-    # dropping the dummy column
-    perf_profile.drop("time:timestamp", axis=1, inplace=True)
+    unknown = set(features) - set(PERFORMANCE_FEATURES)
+    if unknown:
+        raise ValueError("Unknown performance features %s" % sorted(unknown))
+
+    codes, cases = case_codes(log_pd) if codes is None else codes
+
+    timestamps = log_pd["time:timestamp"]
+    if getattr(timestamps.dt, "tz", None) is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    timestamps = timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    mask = codes >= 0
+    grouped = pd.Series(timestamps[mask]).groupby(codes[mask])
+    stats = grouped.agg(["min", "max", "size"])
+
+    span = (stats["max"] - stats["min"]).to_numpy()
+    events = stats["size"].to_numpy()
+
+    perf_profile = pd.DataFrame({"case:concept:name": cases[stats.index.to_numpy()]})
+    for feature in features:
+        if feature == "duration":
+            # total case duration in full days
+            perf_profile["duration"] = span // DAY
+        elif feature == "events":
+            # number of events
+            perf_profile["events"] = events
+        elif feature == "mean_gap":
+            # the gaps of the sorted events add up to the total duration
+            gaps = np.maximum(events - 1, 1)
+            perf_profile["mean_gap"] = span / gaps / DAY
+        elif feature == "active_days":
+            days = pd.Series(timestamps[mask] // DAY).groupby(codes[mask])
+            perf_profile["active_days"] = days.nunique().to_numpy()
 
     logger.debug("Length of activity profile is %s", len(perf_profile))
-    logger.debug("Mean of duration is %s", perf_profile.mean(axis=0))
+    logger.debug("Mean of duration is %s", perf_profile.mean(axis=0, numeric_only=True))
 
     logger.info("Performance Profile is created")
 
@@ -114,11 +274,7 @@ def profile_grade(grade_profile=pd.DataFrame):
 
     logger.info("Creating the grades profile started")
     # mimicking the case_id creation from the event log
-    dummy = []
-    for i, rows in grade_profile.iterrows():
-        dummy.append(case_id(rows, keys))
-
-    grade_profile["case:concept:name"] = dummy
+    grade_profile["case:concept:name"] = case_ids(grade_profile, keys)
 
     grade_profile["score"] = grade_profile["score"] * grade_profile["weight"] / 100
 
@@ -140,7 +296,9 @@ def profile_grade(grade_profile=pd.DataFrame):
     return grade_profile
 
 
-def profile_vle(vle=pd.DataFrame, log_pd=pd.DataFrame):
+def profile_vle(
+    vle=pd.DataFrame, log_pd=pd.DataFrame, sparse=False, codes=None, aligned=False
+):
     """This function creates the vle profile used in
     clustering.
 
@@ -148,6 +306,10 @@ def profile_vle(vle=pd.DataFrame, log_pd=pd.DataFrame):
     a learning page was opened by each trace (as part of
     the interaction activity in the event log)
 
+    The activity type of every event is gathered from a dense
+    lookup array indexed by the site (see site_lookup), instead of
+    merging the event log with the vle table
+
     Args:
         vle:
             a pd dataframe containing the key between the
@@ -155,6 +317,16 @@ def profile_vle(vle=pd.DataFrame, log_pd=pd.DataFrame):
             actual associated pages
         log_pd:
             a dataframe which contains the event log
+        sparse:
+            a boolean value that tells if the counts should be
+            kept sparse (see count_profile). Prefilled with False
+        codes:
+            the case codes and case ids of the log (see
+            case_codes), computed if not given
+        aligned:
+            a boolean value that tells if every case of the log
+            should be kept, also the ones without interactions.
+            Prefilled with False
 
     Returns: A pandas dataframe with the vle profile
 
@@ -162,20 +334,97 @@ def profile_vle(vle=pd.DataFrame, log_pd=pd.DataFrame):
     logger = logging.getLogger("vle_profile")
     logger.setLevel(logging.DEBUG)
 
-    vle_profile = log_pd[["case:concept:name", "site"]].merge(vle, on="site")
     logger.info("Creating the vle profile started")
-    vle_profile = vle_profile.groupby("case:concept:name")["activity_type"].apply(list)
 
-    vle_profile = vle_profile.reset_index()
+    lookup, types = site_lookup(vle)
+
+    # gathering the activity type of every event with a known site
+    sites = pd.to_numeric(log_pd["site"], errors="coerce")
+    sites = sites.to_numpy(dtype=float, na_value=np.nan)
+    known = (sites >= 0) & (sites < len(lookup))
+    type_codes = np.full(len(sites), -1, dtype=np.int64)
+    type_codes[known] = lookup[sites[known].astype(np.int64)]
 
-    dummy = list(vle_profile["activity_type"].apply(lambda x: collections.Counter(x)))
-    dummy = pd.DataFrame(dummy)
-    dummy["case:concept:name"] = vle_profile["case:concept:name"]
-    dummy = dummy.fillna(0)
-    vle_profile = dummy
+    codes, cases = case_codes(log_pd) if codes is None else codes
+    mask = (codes >= 0) & (type_codes >= 0)
+
+    # only the activity types (and cases) with interactions are kept
+    type_codes, used_types = used_codes(type_codes[mask], len(types))
+    if aligned:
+        codes = codes[mask]
+    else:
+        codes, used_cases = used_codes(codes[mask], len(cases))
+        cases = cases[used_cases]
+
+    vle_profile = count_codes(
+        codes, cases, type_codes, types[used_types], sparse=sparse
+    )
 
     logger.debug("Length of the vle profile is \n %s", len(vle_profile))
-    logger.debug("Mean vle interactions are: \n %s", vle_profile.mean(axis=0))
+    logger.debug(
+        "Mean vle interactions are: \n %s", vle_profile.mean(axis=0, numeric_only=True)
+    )
 
     logger.info("vle Profile created")
     return vle_profile
+
+
+# profiles computed from the event log by profile_log
+LOG_PROFILES = ["activity", "performance", "vle"]
+
+
+def profile_log(
+    log_pd=pd.DataFrame,
+    profiles=("activity", "performance", "vle"),
+    vle=None,
+    sparse=False,
+    features=("duration", "events"),
+):
+    """This function creates all the requested event log profiles
+    used in clustering from one grouping of the log.
+
+    The cases get factorized once and the codes are shared by the
+    profiles, so every profile has the same rows: all the cases of
+    the log, sorted by case id
+
+    Args:
+        log_pd: an event log in a pandas dataframe
+        profiles: the profiles to be created (see LOG_PROFILES)
+        vle: a pd dataframe with the activity type of every vle page,
+             needed for the vle profile
+        sparse: a boolean value that tells if the count profiles
+                should be kept sparse (see count_codes). Prefilled
+                with False
+        features: the features of the performance profile (see
+                  profile_performance)
+
+    Returns:
+        A dict with the profile name as key and the profile
+        dataframe as value
+    """
+    logger = logging.getLogger("profile_log")
+    logger.setLevel(logging.DEBUG)
+
+    unknown = set(profiles) - set(LOG_PROFILES)
+    if unknown:
+        raise ValueError("Unknown profiles %s" % sorted(unknown))
+    if "vle" in profiles and vle is None:
+        raise ValueError("The vle profile needs the vle dataframe")
+
+    codes = case_codes(log_pd)
+    logger.info("%s cases are profiled", len(codes[1]))
+
+    log_profiles = {}
+    for profile in profiles:
+        if profile == "activity":
+            log_profiles[profile] = profile_activity(log_pd, sparse=sparse, codes=codes)
+        elif profile == "performance":
+            log_profiles[profile] = profile_performance(
+                log_pd, features=features, codes=codes
+            )
+        elif profile == "vle":
+            log_profiles[profile] = profile_vle(
+                vle, log_pd, sparse=sparse, codes=codes, aligned=True
+            )
+
+    return log_profiles
@@ -1,11 +1,21 @@
-import datetime
+import glob
+import hashlib
+import json
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from distutils.debug import DEBUG
 from distutils.log import debug
 
 import pandas as pd
 import pm4py
 
+from func.utils import file_digest, presentation_start
+from func.xes import xes_export, xes_import
+
+# the presentations the event log is generated for by default
+PRESENTATIONS = ("2014J",)
+
 
 def case_id(row, info):
     """Function that creates the case id for every case based on
@@ -30,6 +40,29 @@ def case_id(row, info):
     return id
 
 
+def case_ids(data, info):
+    """Columnar version of case_id. Creates the case id for every
+    row of a dataframe at once instead of row by row.
+
+    Args:
+        data:
+            the df where the events appear
+        info:
+            the columns that have to be included in the id
+
+    Returns:
+        A pd series with the generated case ids, aligned with the
+        index of data. An example is: 100064_FFF_2013J
+    """
+
+    ids = data[info[0]].astype(str)
+
+    for i in info[1:]:
+        ids = ids + "_" + data[i].astype(str)
+
+    return ids
+
+
 def time_conversion(date, date_start):
     """
     Converts the time as measured by the data source to
@@ -45,20 +78,37 @@ def time_conversion(date, date_start):
     Returns:
         The date of the event in datetime format
     """
-    year_start = int(date_start[0:4])
+    ts = presentation_start(date_start)
 
-    if date_start[4] == "B":
-        month_start = 2
-    else:
-        month_start = 10
+    do = pd.tseries.offsets.DateOffset(n=int(date))
 
-    x = datetime.datetime(year_start, month_start, 1)
+    return ts + do
 
-    ts = pd.Timestamp(x)
 
-    do = pd.tseries.offsets.DateOffset(n=int(date))
+def time_conversions(dates, date_starts):
+    """
+    Columnar version of time_conversion. The start date of every
+    presentation is resolved only once through a lookup table and the
+    day offsets get added to the whole column at once
 
-    return ts + do
+    Args:
+        dates:
+            pd series with the number of days since the
+            start of the course until the event
+        date_starts:
+            pd series with the presentation code of every event
+
+    Returns:
+        A pd series with the dates of the events in datetime format,
+        aligned with the index of dates
+    """
+    lookup = {code: presentation_start(code) for code in date_starts.unique()}
+    starts = date_starts.map(lookup).astype("datetime64[ns]")
+
+    # int64 cast truncates the offsets the same way int() does
+    offsets = pd.to_timedelta(dates.astype("int64"), unit="D")
+
+    return starts + offsets
 
 
 def student_assessment(
@@ -66,8 +116,8 @@ def student_assessment(
     data_path=str,
     file_assessments="assessments.csv",
     file_students="studentAssessment.csv",
+    presentations=PRESENTATIONS,
 ):
-
     """Reads-in the information about students and their assigments
     and extracts the information needed for the event log.
 
@@ -82,6 +132,8 @@ def student_assessment(
         file_students:
             Name of the file where each assessment of each
             student can be found
+        presentations:
+            the presentations the events are extracted for
 
     Returns:
         A pandas dataframe that can be easily converted to
@@ -95,22 +147,18 @@ def student_assessment(
     data_a = pd.read_csv(data_path + file_students)
     logger.debug("student assessment data successfully read")
 
-    # we only want 2014 data
-    data = pd.merge(data_S, data_a, on="id_assessment", how="inner").query(
-        " code_presentation == '2014J' "
-    )
+    # we only want the data of the selected presentations
+    data = pd.merge(data_S, data_a, on="id_assessment", how="inner")
+    data = data[data["code_presentation"].isin(presentations)]
 
     data.reset_index(inplace=True, drop=True)
     logger.debug("student assessment data successfully merged")
 
-    dummy = []
-    time_dummy = []
-    for i, rows in data.iterrows():
-        # creating the case_id
-        dummy.append(case_id(rows, keys))
-        time_dummy.append(
-            time_conversion(rows["date_submitted"], rows["code_presentation"])
-        )
+    # creating the case_id
+    dummy = case_ids(data, keys).to_numpy()
+    time_dummy = time_conversions(
+        data["date_submitted"], data["code_presentation"]
+    ).to_numpy()
     logger.debug("student assessment ids and timestamps successfully generated")
 
     # creating the result
@@ -126,10 +174,58 @@ def student_assessment(
     return el_sa
 
 
-def student_registration(keys=list, data_path=str, file="studentRegistration.csv"):
+# activities extracted from the registration file and the column holding their date
+REGISTRATION_EVENTS = {
+    "register": "date_registration",
+    "dropped": "date_unregistration",
+}
+
+
+def date_events(data, keys, time_column, activity):
     """
-    Reads in registration data about students and extracts events
-    from a csv file
+    Extracts the events of one activity from an already read-in
+    and filtered dataframe
+
+    Args:
+        data:
+            the df from which the events are extracted
+        keys:
+            the columns used in the creation of the case id
+        time_column:
+            the column holding the number of days since the start
+            of the course until the event
+        activity:
+            the name of the activity, e.g. register
+
+    Returns:
+        A pandas dataframe with the events of the activity
+    """
+    # dropping the rows without a date -> no action=no event
+    data = data.dropna(axis=0, subset=[time_column])
+
+    # creating the case_id
+    dummy = case_ids(data, keys).to_numpy()
+    time_dummy = time_conversions(
+        data[time_column], data["code_presentation"]
+    ).to_numpy()
+
+    # creating an event log dataframe
+    el_date = pd.DataFrame({"case:concept:name": dummy, "time:timestamp": time_dummy})
+    el_date["concept:name"] = activity
+
+    return el_date
+
+
+def registration_events(
+    keys=list,
+    data_path=str,
+    file="studentRegistration.csv",
+    events=None,
+    presentations=PRESENTATIONS,
+):
+    """
+    Reads in registration data about students once and extracts
+    the events of several activities from it
 
     Args:
         keys:
@@ -139,46 +235,83 @@ def student_registration(keys=list, data_path=str, file="studentRegistration.csv
         file:
             Name of the file where the registration information
             can be found
+        events:
+            A dict with the activities to be extracted and the column
+            holding their date. Prefilled with REGISTRATION_EVENTS
+        presentations:
+            the presentations the events are extracted for
 
     Returns:
         A pandas dataframe with registration events that can be
         easily converted to an event log
     """
-    logger = logging.getLogger("student_registration")
+    logger = logging.getLogger("registration_events")
     logger.setLevel(logging.INFO)
 
+    if events is None:
+        events = REGISTRATION_EVENTS
+
     data = pd.read_csv(data_path + file)
     logger.debug("registration data successfully read")
 
     # we are interested in only a part of the event log
-    data = data.query(" code_presentation == '2014J' ")
+    data = data[data["code_presentation"].isin(presentations)]
     data.reset_index(inplace=True, drop=True)
-    logger.debug("registration data succesfully filtered for 2014J")
-
-    # dropping the rows where the student did not register -> no registration=no event
-    data = data.dropna(axis=0, subset=["date_registration"])
-
-    dummy = []
-    time_dummy = []
-    for i, rows in data.iterrows():
-        # creating the case_id
-        dummy.append(case_id(rows, keys))
-        time_dummy.append(
-            time_conversion(rows["date_registration"], rows["code_presentation"])
-        )
-
-    logger.debug("registration case ids and timestamps succesfully created")
+    logger.debug("registration data succesfully filtered for %s", presentations)
 
-    # creating an event log dataframe
-    el_reg = pd.DataFrame({"case:concept:name": dummy, "time:timestamp": time_dummy})
-    el_reg["concept:name"] = "register"
+    el_reg = pd.concat(
+        [
+            date_events(data, keys, time_column, activity)
+            for activity, time_column in events.items()
+        ],
+        ignore_index=True,
+    )
 
-    logger.debug("event log for REGISTRATIONS successfully generated")
+    logger.debug("event log for %s successfully generated", list(events))
 
     return el_reg
 
 
-def student_unregistration(keys=list, data_path=str, file="studentRegistration.csv"):
+def student_registration(
+    keys=list,
+    data_path=str,
+    file="studentRegistration.csv",
+    presentations=PRESENTATIONS,
+):
+    """
+    Reads in registration data about students and extracts events
+    from a csv file
+
+    Args:
+        keys:
+            the columns used in the creation of the case id
+        data_path:
+            The path to the folder with data
+        file:
+            Name of the file where the registration information
+            can be found
+        presentations:
+            the presentations the events are extracted for
+
+    Returns:
+        A pandas dataframe with registration events that can be
+        easily converted to an event log
+    """
+    return registration_events(
+        keys=keys,
+        data_path=data_path,
+        file=file,
+        events={"register": REGISTRATION_EVENTS["register"]},
+        presentations=presentations,
+    )
+
+
+def student_unregistration(
+    keys=list,
+    data_path=str,
+    file="studentRegistration.csv",
+    presentations=PRESENTATIONS,
+):
     """
     Reads in unregistration data about students and extracts events
     from a csv file
@@ -191,47 +324,117 @@ def student_unregistration(keys=list, data_path=str, file="studentRegistration.c
         file:
             Name of the file where the unregistration information
             can be found
+        presentations:
+            the presentations the events are extracted for
 
     Returns:
         A pandas dataframe with unregistration events that can be
         easily converted to an event log
     """
+    return registration_events(
+        keys=keys,
+        data_path=data_path,
+        file=file,
+        events={"dropped": REGISTRATION_EVENTS["dropped"]},
+        presentations=presentations,
+    )
 
-    logger = logging.getLogger("student_unregistration")
-    logger.setLevel(logging.INFO)
 
-    data = pd.read_csv(data_path + file)
-    logger.debug("unregistration data successfully read")
+# compact dtypes for the columns of studentVle.csv
+VLE_DTYPES = {
+    "code_module": "category",
+    "code_presentation": "category",
+    "id_student": "int32",
+    "id_site": "int32",
+    "date": "int16",
+    "sum_click": "int32",
+}
 
-    # we are interested in only a part of the event log
-    data = data.query(" code_presentation == '2014J' ")
-    data.reset_index(inplace=True, drop=True)
-    logger.debug("unregistration data succesfully filtered for 2014J")
-
-    # dropping rows where the student did not unregister -> no action=no event
-    data = data.dropna(axis=0, subset=["date_unregistration"])
-
-    dummy = []
-    time_dummy = []
-    for i, rows in data.iterrows():
-        # creating the case_id
-        dummy.append(case_id(rows, keys))
-        time_dummy.append(
-            time_conversion(rows["date_unregistration"], rows["code_presentation"])
-        )
 
-    logger.debug("unregistration case ids and timestamps succesfully created")
+def vle_events(data, keys):
+    """
+    Extracts the vle interaction events from an already read-in
+    and filtered dataframe
+
+    Args:
+        data:
+            the df with the vle interaction information
+        keys:
+            the columns used in the creation of the case id
+
+    Returns:
+        A pandas dataframe with vle interaction events
+    """
+    data = data.reset_index(drop=True)
+
+    # creating the case_id
+    dummy = case_ids(data, keys).to_numpy()
+    time_dummy = time_conversions(data["date"], data["code_presentation"]).to_numpy()
 
     # creating an event log dataframe
-    el_unreg = pd.DataFrame({"case:concept:name": dummy, "time:timestamp": time_dummy})
-    el_unreg["concept:name"] = "dropped"
+    el_vle = pd.DataFrame({"case:concept:name": dummy, "time:timestamp": time_dummy})
+    el_vle["concept:name"] = "interact"
+    el_vle["site"] = data["id_site"]
 
-    logger.debug("event log for UNREGISTRATIONS successfully generated")
+    return el_vle
 
-    return el_unreg
 
+def vle_interaction_chunks(
+    keys=list,
+    data_path=str,
+    file="studentVle.csv",
+    chunksize=1000000,
+    presentations=PRESENTATIONS,
+):
+    """
+    Streams Virtual Learning Environment (vle) interaction data
+    about students from a csv file and extracts events chunk by
+    chunk. Only the needed columns are read, with compact dtypes,
+    so the memory used stays the same no matter the size of the file
 
-def vle_interaction(keys=list, data_path=str, file="studentVle.csv"):
+    Args:
+        keys:
+            the columns used in the creation of the case id
+        data_path:
+            The path to the folder with data
+        file:
+            Name of the file where the vle interaction information
+            can be found
+        chunksize:
+            Number of rows read in at once
+        presentations:
+            the presentations the events are extracted for
+
+    Yields:
+        pandas dataframes with the vle interaction events of
+        every chunk
+    """
+    logger = logging.getLogger("vle_interaction")
+    logger.setLevel(logging.DEBUG)
+
+    columns = list(dict.fromkeys(keys + ["code_presentation", "id_site", "date"]))
+    dtypes = {column: VLE_DTYPES[column] for column in columns if column in VLE_DTYPES}
+
+    reader = pd.read_csv(
+        data_path + file, usecols=columns, dtype=dtypes, chunksize=chunksize
+    )
+
+    for i, data in enumerate(reader):
+        # we are interested in only a part of the event log
+        data = data[data["code_presentation"].isin(presentations)]
+        logger.debug("vle chunk %s succesfully filtered for %s", i, presentations)
+
+        if len(data) > 0:
+            yield vle_events(data, keys)
+
+
+def vle_interaction(
+    keys=list,
+    data_path=str,
+    file="studentVle.csv",
+    chunksize=None,
+    presentations=PRESENTATIONS,
+):
     """
     Reads in Virtual Learning Environment (vle) interaction
     data about students and extracts events from a csv file
@@ -244,6 +447,12 @@ def vle_interaction(keys=list, data_path=str, file="studentVle.csv"):
         file:
             Name of the file where the vle interaction information
             can be found
+        chunksize:
+            If given, the file is streamed in chunks of this many
+            rows (see vle_interaction_chunks). Prefilled with None,
+            which reads the whole file at once
+        presentations:
+            the presentations the events are extracted for
 
     Returns:
         A pandas dataframe with vle interaction events that can be
@@ -252,45 +461,403 @@ def vle_interaction(keys=list, data_path=str, file="studentVle.csv"):
     logger = logging.getLogger("vle_interaction")
     logger.setLevel(logging.DEBUG)
 
+    if chunksize:
+        chunks = list(
+            vle_interaction_chunks(
+                keys=keys,
+                data_path=data_path,
+                file=file,
+                chunksize=chunksize,
+                presentations=presentations,
+            )
+        )
+        if not chunks:
+            return pd.DataFrame(
+                columns=["case:concept:name", "time:timestamp", "concept:name", "site"]
+            )
+
+        el_vle = pd.concat(chunks, ignore_index=True)
+        logger.debug(
+            "event log for VLE successfully generated from %s chunks", len(chunks)
+        )
+
+        return el_vle
+
     data = pd.read_csv(data_path + file)
     logger.debug("vle data successfully read")
 
     # we are interested in only a part of the event log
-    data = data.query(" code_presentation == '2014J' ")
-    data.reset_index(inplace=True, drop=True)
-    logger.debug("vle data succesfully filtered for 2014J")
-
-    dummy = []
-    time_dummy = []
-    for i, rows in data.iterrows():
-        # creating the case_id
-        dummy.append(case_id(rows, keys))
-        time_dummy.append(time_conversion(rows["date"], rows["code_presentation"]))
-    logger.debug("vle case ids and timestamps succesfully created")
+    data = data[data["code_presentation"].isin(presentations)]
+    logger.debug("vle data succesfully filtered for %s", presentations)
 
-    # creating an event log dataframe
-    el_vle = pd.DataFrame({"case:concept:name": dummy, "time:timestamp": time_dummy})
-    el_vle["concept:name"] = "interact"
-    el_vle["site"] = data["id_site"]
+    el_vle = vle_events(data, keys)
+    logger.debug("vle case ids and timestamps succesfully created")
 
     logger.debug("event log for VLE successfully generated")
 
     return el_vle
 
 
-def event_log_generation():
+def run_extractor(extractor):
+    """Runs one extractor. It is defined at module level so that
+    it can be sent to the worker processes of a process pool
+
+    Args:
+        extractor:
+            a tuple with the extracting function and a dict
+            with its keyword arguments
+
+    Returns:
+        The pandas dataframe returned by the extracting function
+    """
+    function, kwargs = extractor
+
+    return function(**kwargs)
+
+
+# the OULAD files the event log is generated from
+SOURCE_FILES = [
+    "assessments.csv",
+    "studentAssessment.csv",
+    "studentRegistration.csv",
+    "studentVle.csv",
+]
+
+
+def presentation_digests(
+    data_path=str, presentations=list, files=SOURCE_FILES, chunksize=1000000
+):
+    """Computes a digest of the rows every presentation has in the
+    source files, in one scan of every file. Rows of other
+    presentations do not change the digest of a presentation, so
+    adding a presentation to the files keeps the others unchanged
+
+    Args:
+        data_path: The path to the folder with data
+        presentations: the presentations to be fingerprinted
+        files: the source files to be scanned. Prefilled with
+               SOURCE_FILES
+        chunksize: the number of rows hashed at once
+
+    Returns:
+        A dict with the hex digest of the rows of every presentation
+        in every file, e.g. {"studentVle.csv": {"2014J": "3f2a..."}}
+    """
+    digests = {
+        file: {presentation: hashlib.sha256() for presentation in presentations}
+        for file in files
+    }
+
+    # studentAssessment.csv gets the presentation through the assessment
+    if "studentAssessment.csv" in files:
+        assessments = pd.read_csv(
+            data_path + "assessments.csv",
+            usecols=["id_assessment", "code_presentation"],
+        )
+        assessment_presentation = assessments.set_index("id_assessment")[
+            "code_presentation"
+        ]
+
+    for file in files:
+        reader = pd.read_csv(data_path + file, chunksize=chunksize)
+        for i, data in enumerate(reader):
+            if i == 0:
+                for digest in digests[file].values():
+                    digest.update(json.dumps(list(data.columns)).encode())
+
+            if "code_presentation" in data.columns:
+                codes = data["code_presentation"]
+            else:
+                codes = data["id_assessment"].map(assessment_presentation)
+
+            # the numbers are hashed as floats, so the digest does not depend
+            # on the dtypes inferred for every chunk
+            for column in data.columns:
+                if pd.api.types.is_numeric_dtype(data[column]):
+                    data[column] = data[column].astype("float64")
+                else:
+                    data[column] = data[column].astype(str)
+
+            hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+            for presentation, digest in digests[file].items():
+                digest.update(hashes[(codes == presentation).to_numpy()].tobytes())
+
+    return {
+        file: {
+            presentation: digest.hexdigest()
+            for presentation, digest in digests[file].items()
+        }
+        for file in files
+    }
+
+
+# the modules of this repository the events are extracted with
+EXTRACTION_MODULES = [
+    __file__,
+    os.path.join(os.path.dirname(__file__), "utils.py"),
+]
+
+
+def event_log_fingerprint(keys=list, presentation=str):
+    """Fingerprints the settings the event log of one presentation
+    is generated with: the case id keys, the presentation, the code
+    of the extraction modules and the versions of pandas and pm4py.
+    The source files are checked separately with the digests stored
+    next to the shard (see shard_sources)
+
+    Args:
+        keys:
+            the columns used in the creation of the case id
+        presentation:
+            the presentation the event log is generated for
+
+    Returns:
+        The hex digest identifying the event log
+    """
+    digest = hashlib.sha256()
+
+    settings = {
+        "keys": list(keys),
+        "presentation": presentation,
+        "pandas": pd.__version__,
+        "pm4py": pm4py.__version__,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+
+    for module in EXTRACTION_MODULES:
+        digest.update(file_digest(module).encode())
+
+    return digest.hexdigest()
+
+
+def event_log_extraction(
+    keys=list, data_path=str, presentations=PRESENTATIONS, workers=None
+):
+    """Runs the extractors and builds the event log dataframe
+
+    Args:
+        keys:
+            the columns used in the creation of the case id
+        data_path:
+            The path to the folder with data
+        presentations:
+            the presentations the events are extracted for
+        workers:
+            number of processes used for running the extractors
+            concurrently. Prefilled with None, which runs them one
+            after another
+
+    Returns:
+        The event log in a pandas dataframe formatted for pm4py.
+    """
+    logger_general = logging.getLogger("general")
+    logger_general.setLevel(logging.INFO)
+
+    arguments = {"keys": keys, "data_path": data_path, "presentations": presentations}
+
+    # the previously created fucntions for extracting event logs. Registrations
+    # and unregistrations come from a single read of the file and the largest
+    # table is streamed in chunks to keep the memory bounded
+    extractors = [
+        (student_assessment, arguments),
+        (registration_events, arguments),
+        (vle_interaction, dict(arguments, chunksize=1000000)),
+    ]
+
+    if workers and workers > 1:
+        logger_general.info("Running the extractors on %s processes", workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map keeps the order of the extractors, so the merge is deterministic
+            results = list(executor.map(run_extractor, extractors))
+    else:
+        results = [run_extractor(extractor) for extractor in extractors]
+    logger_general.info("Assessment, registration and VLE events created")
+
+    # concatenating the results
+    event_log = pd.concat(results)
+
+    # formatting the results for process minig
+    event_log = pm4py.format_dataframe(
+        event_log,
+        case_id="case:concept:name",
+        activity_key="concept:name",
+        timestamp_key="time:timestamp",
+        timest_format="%Y-%m-%d",
+    )
+
+    event_log = event_log.sort_values("time:timestamp", kind="mergesort")
+    event_log = event_log.reset_index(drop=True)
+    event_log.drop("@@index", axis=1, inplace=True)
+    logger_general.info("Data Concatenated and Formated")
+
+    return event_log
+
+
+def shard_path(shard_dir=str, presentation=str, fingerprint=str):
+    """Gets the path of the shard of one presentation
+
+    Args:
+        shard_dir: the folder with the shards
+        presentation: the presentation of the shard
+        fingerprint: the fingerprint of the settings of the shard
+
+    Returns:
+        The path of the shard, e.g. event_log_shards/2014J_3f2a...feather
+    """
+    return os.path.join(shard_dir, "%s_%s.feather" % (presentation, fingerprint[:16]))
+
+
+def shard_write(event_log, shard_dir=str, presentation=str, fingerprint=str):
+    """Writes the event log of one presentation as a shard and removes
+    the older shards of the same presentation
+
+    Args:
+        event_log: the event log of the presentation in a pandas dataframe
+        shard_dir: the folder with the shards
+        presentation: the presentation of the event log
+        fingerprint: the fingerprint of the settings of the event log
+
+    Returns:
+        The path of the shard
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    shard = shard_path(shard_dir, presentation, fingerprint)
+
+    # writing through a temporary file so a shard is never partial
+    event_log_write(event_log, shard + ".tmp")
+    os.replace(shard + ".tmp", shard)
+
+    for stale in glob.glob(os.path.join(shard_dir, presentation + "_*.feather")):
+        if stale != shard:
+            os.remove(stale)
+            if os.path.exists(stale + ".json"):
+                os.remove(stale + ".json")
+
+    return shard
+
+
+def shard_sources(shard=str):
+    """Reads the digests of the source files a shard was built from
+
+    Args:
+        shard: the path of the shard
+
+    Returns:
+        A dict with the digest of the bytes of every source file
+        ("files") and of the rows of the presentation in every
+        source file ("rows"), or None if the shard has no digests
+    """
+    if not os.path.exists(shard) or not os.path.exists(shard + ".json"):
+        return None
+
+    with open(shard + ".json") as file:
+        return json.load(file)
+
+
+def shard_sources_write(shard=str, sources=dict):
+    """Writes the digests of the source files a shard was built
+    from next to the shard, as <shard>.json
+
+    Args:
+        shard: the path of the shard
+        sources: a dict with the "files" and "rows" digests
+                 (see shard_sources)
+    """
+    with open(shard + ".json.tmp", "w") as file:
+        json.dump(sources, file, indent=2, sort_keys=True)
+    os.replace(shard + ".json.tmp", shard + ".json")
+
+
+def shard_paths(shard_dir=str, presentations=None):
+    """Finds the shards of an event log
+
+    Args:
+        shard_dir: the folder with the shards
+        presentations: the presentations to be found. Prefilled with
+                       None, which finds the shards of all presentations
+
+    Returns:
+        A dict with the path of the shard of every presentation
+    """
+    paths = {}
+
+    # the newest shard wins if an older one was left behind
+    shards = glob.glob(os.path.join(shard_dir, "*.feather"))
+    shards = sorted(shards, key=os.path.getmtime)
+    for shard in shards:
+        presentation = os.path.basename(shard).split("_")[0]
+        if presentations is None or presentation in presentations:
+            paths[presentation] = shard
+
+    return paths
+
+
+def shard_merge(shards=list):
+    """Merges the event logs of several presentations into one
+    event log sorted by time
+
+    Args:
+        shards: a list with the event log dataframes of the presentations
+
+    Returns:
+        The merged event log in a pandas dataframe
+    """
+    event_log = pd.concat(shards, ignore_index=True)
+
+    # the case index of every shard starts from 0, so it is numbered again
+    # on the union, the same way pm4py numbers it
+    event_log["@@case_index"] = event_log.groupby("case:concept:name").ngroup()
+
+    event_log = event_log.sort_values("time:timestamp", kind="mergesort")
+
+    return event_log.reset_index(drop=True)
+
+
+def event_log_generation(
+    presentations=PRESENTATIONS,
+    workers=None,
+    output="simple_event_log.feather",
+    xes=None,
+    shard_dir="event_log_shards",
+):
     """
     This function acts as a main function for event log generation
 
     It runs all the above functions in order to achieve an event log.
     It handles preprocessing of the data from the relational db and
     it structures the extraction in a pandas dataframe built following
-    the rigors of pm4py. Afterwardsm the pd dataframe gets converted
-    to an event log, which also gets parsed to a .xes file format for
-    persistance. The runtime of the function is significant.
+    the rigors of pm4py. Afterwards the pd dataframe gets written to
+    a columnar file for persistance and can optionally also be parsed
+    to a .xes file. The runtime of the function is significant.
+
+    The events of every presentation are stored as an independent
+    shard, named after the fingerprint of its settings, next to the
+    digests of the source files it was built from. When the bytes of
+    the files are unchanged the shard is reused without parsing them.
+    Otherwise only the changed files are parsed, and the shard is
+    only rebuilt if the rows of its presentation changed, so adding
+    a presentation only costs the processing of that presentation.
+
+    Args:
+        presentations:
+            the presentations the event log is generated for
+        workers:
+            number of processes used for running the extractors
+            concurrently. Prefilled with None, which runs them one
+            after another
+        output:
+            path of the columnar (.feather) file the merged event
+            log gets written to. If None, it is not written
+        xes:
+            path of a .xes file the event log also gets exported
+            to (gzip compressed if it ends in .gz). Prefilled with
+            None, which skips the xes export
+        shard_dir:
+            folder where the shards of the presentations are
+            stored. If None, the event log is always rebuilt
 
     Returns:
-       An event log in the pm4py environment.
+       The event log in a pandas dataframe formatted for pm4py.
     """
     # starting a logger
     logging.basicConfig()
@@ -304,71 +871,195 @@ def event_log_generation():
     keys = ["id_student", "code_module", "code_presentation"]
     data_path = "data/"
 
-    # applying the previously created fucntions for extracting event logs
-    student_assessment = student_assessment(keys=keys, data_path=data_path)
-    logger_general.info("Student Assessments events created")
+    # the shards are split by the presentation in the case id
+    if "code_presentation" not in keys:
+        raise ValueError("the case id keys must include code_presentation")
+
+    shards = {}
+    missing = list(presentations)
+
+    if shard_dir:
+        fingerprints = {
+            presentation: event_log_fingerprint(keys, presentation)
+            for presentation in presentations
+        }
+        # hashing the bytes of the files is much cheaper than parsing them
+        files = {file: file_digest(data_path + file) for file in SOURCE_FILES}
+
+        sources = {}
+        changed = {}
+        for presentation in presentations:
+            shard = shard_path(shard_dir, presentation, fingerprints[presentation])
+            sources[presentation] = shard_sources(shard)
+
+            if sources[presentation] is None:
+                continue
+
+            changed[presentation] = [
+                file
+                for file in SOURCE_FILES
+                if sources[presentation]["files"].get(file) != files[file]
+            ]
+            if not changed[presentation]:
+                logger_general.info("Inputs unchanged, %s is reused", shard)
+                shards[presentation] = event_log_read(shard)
+                del changed[presentation]
+
+        # the rows are only parsed for the new shards and the changed files
+        new = [
+            presentation
+            for presentation in presentations
+            if sources[presentation] is None
+        ]
+        scanned = [
+            file
+            for file in SOURCE_FILES
+            if new or any(file in changed_files for changed_files in changed.values())
+        ]
+        rows = {}
+        if scanned:
+            rows = presentation_digests(data_path, new + list(changed), scanned)
+
+        for presentation in new + list(changed):
+            if sources[presentation] is None:
+                sources[presentation] = {"rows": {}}
+
+            # the digests of the unscanned files are still valid
+            old_rows = dict(sources[presentation]["rows"])
+            for file in scanned:
+                sources[presentation]["rows"][file] = rows[file][presentation]
+            sources[presentation]["files"] = files
+
+            if presentation in changed and all(
+                old_rows.get(file) == rows[file][presentation]
+                for file in changed[presentation]
+            ):
+                shard = shard_path(shard_dir, presentation, fingerprints[presentation])
+                logger_general.info(
+                    "Rows of %s unchanged, %s is reused", presentation, shard
+                )
+                shards[presentation] = event_log_read(shard)
+                shard_sources_write(shard, sources[presentation])
+
+        missing = [
+            presentation for presentation in presentations if presentation not in shards
+        ]
 
-    student_registration = student_registration(keys=keys, data_path=data_path)
-    logger_general.info("Student Registration events created")
+    if missing:
+        # all the missing presentations come from one pass over the files
+        event_log = event_log_extraction(
+            keys=keys,
+            data_path=data_path,
+            presentations=missing,
+            workers=workers,
+        )
+        logger_general.info("Events of %s created", missing)
 
-    student_unregistration = student_unregistration(keys=keys, data_path=data_path)
-    logger_general.info("Student Unregistration events created")
+        # the presentation is one of the parts of the case id
+        position = keys.index("code_presentation")
+        codes, cases = pd.factorize(event_log["case:concept:name"])
+        case_presentations = pd.Series(cases).str.split("_").str[position].to_numpy()
+        event_presentations = case_presentations[codes]
 
-    vle_interaction = vle_interaction(keys=keys, data_path=data_path)
-    logger_general.info("VLE interaction events created")
+        for presentation in missing:
+            part = event_log[event_presentations == presentation]
+            shards[presentation] = part.reset_index(drop=True)
 
-    # concatenating the results
-    event_log = pd.concat(
-        [
-            student_assessment,
-            student_registration,
-            student_unregistration,
-            vle_interaction,
-        ]
-    )
+            if shard_dir:
+                shard = shard_write(
+                    shards[presentation],
+                    shard_dir,
+                    presentation,
+                    fingerprints[presentation],
+                )
+                shard_sources_write(shard, sources[presentation])
+                logger_general.info("Events of %s stored in %s", presentation, shard)
 
-    # formatting the results for process minig
-    event_log = pm4py.format_dataframe(
-        event_log,
-        case_id="case:concept:name",
-        activity_key="concept:name",
-        timestamp_key="time:timestamp",
-        timest_format="%Y-%m-%d",
-    )
+    shards = [shards[presentation] for presentation in presentations]
 
-    event_log = event_log.sort_values("time:timestamp").reset_index(drop=True)
-    event_log.drop("@@index", axis=1, inplace=True)
-    logger_general.info("Data Concatenated and Formated")
+    event_log = shard_merge(shards)
 
-    # converting data to xes format
-    from pm4py.objects.conversion.log import converter as log_converter
+    if output:
+        event_log_write(event_log, output)
+        logger_general.info("Event log written to %s", output)
 
-    parameters = {log_converter.Variants.TO_EVENT_LOG.value.Parameters.DEEP_COPY: True}
-    event_log = log_converter.apply(
-        event_log, parameters=parameters, variant=log_converter.Variants.TO_EVENT_LOG
-    )
-    logger_general.info("Data Converted to xes format")
+    if xes:
+        # streaming the sorted dataframe straight to the xes file
+        xes_export(event_log, xes)
+        logger_general.info("Event log exported to %s", xes)
+
+    return event_log
+
+
+# file extensions of the columnar (Arrow IPC) event log format
+COLUMNAR_SUFFIXES = (".feather", ".arrow")
+
+# columns stored as categoricals in the columnar event log format
+CATEGORICAL_COLUMNS = ["case:concept:name", "concept:name"]
+
+
+def event_log_write(event_log, data_path=str):
+    """This function writes an event log dataframe to a columnar
+    Arrow IPC (feather) file. The case and activity columns are
+    stored as categoricals
+
+    Args:
+        event_log: the event log in a pandas dataframe
+        data_path: the path to the .feather file
+    """
+    event_log = event_log.reset_index(drop=True)
+
+    for column in CATEGORICAL_COLUMNS:
+        event_log[column] = event_log[column].astype("category")
+
+    # uncompressed files can be memory-mapped when they are read in
+    event_log.to_feather(data_path, compression="uncompressed")
 
-    # Exporting data to xes file
-    from pm4py.objects.log.exporter.xes import exporter as xes_exporter
 
-    xes_exporter.apply(event_log, "simple_event_log.xes")
+def event_log_read(data_path=str):
+    """This function reads an event log dataframe from a columnar
+    Arrow IPC (feather) file written by event_log_write. The file
+    is memory-mapped instead of being parsed. The categorical case
+    and activity columns are turned back into strings, as pm4py
+    only accepts string columns for them
+
+    Args:
+        data_path: the path to the .feather file
+
+    Returns:
+        The event log in a pandas dataframe
+    """
+    from pyarrow import feather
+
+    event_log = feather.read_table(data_path, memory_map=True).to_pandas()
+
+    for column in CATEGORICAL_COLUMNS:
+        event_log[column] = event_log[column].astype("string")
 
     return event_log
 
 
-def event_log_import(data_path=str, pandas=False):
-    """This function reads an event log from an .xes file
+def event_log_import(data_path=str, pandas=False, log_object=True, presentations=None):
+    """This function reads an event log from an .xes file, from
+    a columnar .feather file or from a folder with shards
 
     Args:
-        data_path: the path to the .xes file
+        data_path: the path to the .xes or .feather file, or to the
+                   folder with the shards of the presentations
         pandas: a boolean value that tells if the event
                 log should also be converted to a pandas
                 dataframe or not. Prefilled with False
+        log_object: a boolean value that tells if the pm4py
+                event log should be built when pandas == True.
+                If False, only the dataframe is read and returned.
+                Prefilled with True
+        presentations: the presentations loaded from a folder with
+                shards. Prefilled with None, which loads all of them
 
     Returns:
         Returns an event log in the pm4py environemnt. Optionally
-        (if pandas == True) it can also return a pandas dataframe
+        (if pandas == True) it can also return a pandas dataframe,
+        or only the pandas dataframe (if log_object == False)
 
     """
     from pm4py.objects.log.importer.xes import importer as xes_importer
@@ -378,6 +1069,33 @@ def event_log_import(data_path=str, pandas=False):
 
     logger.info("Event log is being read from %s", data_path)
 
+    columnar = data_path.endswith(COLUMNAR_SUFFIXES) or os.path.isdir(data_path)
+
+    if columnar or pandas is True:
+        if os.path.isdir(data_path):
+            # loading the union of the wanted shards
+            paths = shard_paths(data_path, presentations)
+            logger.debug("Shards read: %s", paths)
+            log_pd = shard_merge([event_log_read(path) for path in paths.values()])
+        elif data_path.endswith(COLUMNAR_SUFFIXES):
+            # the columnar file already holds the dataframe
+            log_pd = event_log_read(data_path)
+        else:
+            # streaming the xes file straight into columns
+            log_pd = xes_import(data_path)
+        logger.info("Event log read with %s events", len(log_pd))
+
+        if pandas is True and log_object is False:
+            return log_pd
+
+        log = pm4py.convert_to_event_log(log_pd)
+        logger.debug("Length of the event log is %s", len(log))
+
+        if pandas is True:
+            return log, log_pd
+
+        return log
+
     # can be changed to LINE_BY_LINE for better performance
     variant = xes_importer.Variants.ITERPARSE
 
@@ -387,15 +1105,4 @@ def event_log_import(data_path=str, pandas=False):
     logger.debug("Length of the event log is %s", len(log))
     logger.info("Event log read")
 
-    if pandas is True:
-
-        # converting to pandas if we pandas == True
-        import pm4py.objects.conversion.log.converter as converter
-
-        log_pd = converter.apply(log, variant=converter.Variants.TO_DATA_FRAME)
-
-        logger.info("The event log was converted to pandas")
-
-        return log, log_pd
-
     return log
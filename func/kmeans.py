@@ -2,12 +2,81 @@ import logging
 from functools import reduce
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+import scipy.sparse
 from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from sklearn.preprocessing import MaxAbsScaler, StandardScaler
 
 
-def preparing_kmeans(activity_profile, performance_profile, grade_profile, vle_profile):
+def profile_matrix(profile, cases):
+    """Aligns a profile on the given cases as a CSR matrix. Cases
+    missing from the profile get a row of zeros, as done by the
+    left merge and fillna(0) of the dense profiles
+
+    Args:
+        profile: a profile dataframe with a case id column
+        cases: the case ids of the rows of the matrix
+
+    Returns:
+        The CSR matrix and the names of its columns
+    """
+    values = profile.drop("case:concept:name", axis=1)
+
+    if all(isinstance(dtype, pd.SparseDtype) for dtype in values.dtypes):
+        matrix = values.sparse.to_coo().tocsr().astype(float)
+    else:
+        matrix = scipy.sparse.csr_matrix(values.fillna(0).to_numpy(dtype=float))
+
+    # the last row stays empty and is used for the missing cases
+    matrix = scipy.sparse.vstack(
+        [matrix, scipy.sparse.csr_matrix((1, matrix.shape[1]))], format="csr"
+    )
+    rows = pd.Index(profile["case:concept:name"]).get_indexer(cases)
+    rows[rows < 0] = matrix.shape[0] - 1
+
+    return matrix[rows], list(values.columns)
+
+
+def merge_sparse(profiles):
+    """Merges the profiles on the cases of the first one without
+    densifying them
+
+    Args:
+        profiles: a list of profile dataframes
+
+    Returns:
+        data:
+            a dataframe with sparse columns for all the profiles
+            and the case id column
+        X:
+            the merged profiles in a CSR matrix
+    """
+    cases = profiles[0]["case:concept:name"].to_numpy()
+
+    matrices = []
+    columns = []
+    for profile in profiles:
+        matrix, names = profile_matrix(profile, cases)
+        matrices.append(matrix)
+        columns.extend(names)
+
+    X = scipy.sparse.hstack(matrices, format="csr")
+
+    data = pd.DataFrame.sparse.from_spmatrix(X, columns=pd.Index(columns))
+    data["case:concept:name"] = np.asarray(cases)
+
+    return data, X
+
+
+def preparing_kmeans(
+    activity_profile,
+    performance_profile,
+    grade_profile,
+    vle_profile,
+    sparse=False,
+    scaling="maxabs",
+):
     """Function for preparing the data for the kmeans
     clustering alogrithm.
 
@@ -16,6 +85,18 @@ def preparing_kmeans(activity_profile, performance_profile, grade_profile, vle_p
     graph for the elbow method gets prepared, to manually decide
     on the number of clusters
 
+    Args:
+        activity_profile, performance_profile, grade_profile, vle_profile:
+            the profile dataframes (see func.clustering_profiles)
+        sparse:
+            a boolean value that tells if the profiles should be
+            merged, scaled and clustered as a CSR matrix, so the
+            memory scales with the non-zero values. Prefilled with False
+        scaling:
+            the scaler of the sparse path, "maxabs" (MaxAbsScaler) or
+            "standard" (StandardScaler without centering, which would
+            densify the matrix). Prefilled with "maxabs"
+
     Returns:
         data:
             a dataframe with all the profiles appended
@@ -28,16 +109,27 @@ def preparing_kmeans(activity_profile, performance_profile, grade_profile, vle_p
 
     data = [activity_profile, performance_profile, grade_profile, vle_profile]
     logger.debug("The profiles are merged")
-    data = reduce(
-        lambda left, right: pd.merge(
-            left, right, on=["case:concept:name"], how="left"
-        ),
-        data,
-    ).fillna(0)
-
-    X = data.drop("case:concept:name", axis=1)
 
-    X = StandardScaler().fit_transform(X)
+    if sparse:
+        data, X = merge_sparse(data)
+
+        if scaling == "maxabs":
+            X = MaxAbsScaler().fit_transform(X)
+        elif scaling == "standard":
+            X = StandardScaler(with_mean=False).fit_transform(X)
+        else:
+            raise ValueError("Unknown scaling %s" % scaling)
+    else:
+        data = reduce(
+            lambda left, right: pd.merge(
+                left, right, on=["case:concept:name"], how="left"
+            ),
+            data,
+        ).fillna(0)
+
+        X = data.drop("case:concept:name", axis=1)
+
+        X = StandardScaler().fit_transform(X)
 
     logger.info("Elbow graph gets prepared")
     distortions = []
@@ -1,10 +1,44 @@
 import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import pm4py
-import psycopg2
 
-from func.event_log import case_id
+from func.event_log import case_ids
+from func.sql_connection import connection, is_embedded
+
+# columns returned by the grades queries of the domain knowledge
+GRADE_COLUMNS = [
+    "code_module",
+    "code_presentation",
+    "id_student",
+    "id_assessment",
+    "weight",
+    "score",
+    "still_enrolled",
+]
+
+# columns returned by the vle query of the domain knowledge
+VLE_COLUMNS = ["site", "activity_type"]
+
+# wraps a grades query so that the weighting of the scores, the sum per
+# case and the enrollment check run in the database (one row per case)
+AGGREGATE_QUERY = """
+
+SELECT
+    grades.id_student || '_' || grades.code_module || '_' || grades.code_presentation,
+    COALESCE(SUM(grades.score * grades.weight / 100), 0),
+    COUNT(*) FILTER (WHERE grades.still_enrolled) = COUNT(*)
+
+FROM ({query}) AS grades
+
+GROUP BY 1
+
+"""
+
+# columns returned by the aggregated grades query
+KNOWLEDGE_COLUMNS = ["case:concept:name", "score", "still_enrolled"]
 
 
 def ontology_import(query=str):
@@ -24,38 +58,91 @@ def ontology_import(query=str):
     from psycopg2 import Error
 
     try:
-        # Connect to an existing database
-        connection = psycopg2.connect(
-            user="postgres",
-            password="thesis1",
-            host="localhost",
-            port="5433",
-            database="OULAD",
-        )
+        # borrowing a warm connection from the pool
+        with connection() as conn:
+            # Create a cursor to perform database operations
+            with conn.cursor() as cursor:
+                logger.debug("You are connected to - %s", cursor)
 
-        # Create a cursor to perform database operations
-        cursor = connection.cursor()
-
-        logger.debug("You are connected to - %s", cursor)
-
-        # getting the SQL info
-        cursor.execute(query)
-        grades = cursor.fetchall()
+                # getting the SQL info
+                cursor.execute(query)
+                grades = cursor.fetchall()
 
         logger.info("Succesfully read-in the SQL data")
 
     except (Exception, Error) as error:
         logger.warning("Error while connecting to PostgreSQL: %s", error)
+        raise
 
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
-            logger.debug("PostgreSQL connection is closed")
     return grades
 
 
-def domain_knowledge_processing_partitioning(query):
+def ontology_stream(query=str, columns=list, batch_size=10000):
+    """Ontology_stream function streams the result of a query
+    from a PostgreSQL database into pandas, chunk by chunk.
+
+    A named (server-side) cursor is used, so only one batch of
+    rows is held in memory as tuples at any time
+
+    Args:
+        query: the SQL query to be used
+        columns: the names of the columns returned by the query
+        batch_size: the number of rows fetched at once
+
+    Yields:
+        pandas dataframes with the rows of every batch
+    """
+    logger = logging.getLogger("SQL_read_in")
+    logger.setLevel(logging.DEBUG)
+
+    with connection() as conn:
+        if is_embedded(conn):
+            # the embedded backend runs in-process, there is no server side
+            cursor = conn.cursor()
+        else:
+            # a named cursor keeps the result on the server side
+            cursor = conn.cursor(name="ontology_" + uuid.uuid4().hex)
+            cursor.itersize = batch_size
+
+        with cursor:
+            cursor.execute(query)
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                chunk = pd.DataFrame(rows, columns=columns)
+                if "id_assessment" in chunk.columns:
+                    chunk["id_assessment"] = pd.to_numeric(chunk["id_assessment"])
+
+                logger.debug("Batch of %s rows read-in", len(chunk))
+                yield chunk
+
+
+def ontology_frame(query=str, columns=list, batch_size=10000):
+    """Reads the result of a query into one pandas dataframe,
+    building it batch by batch through ontology_stream
+
+    Args:
+        query: the SQL query to be used
+        columns: the names of the columns returned by the query
+        batch_size: the number of rows fetched at once
+
+    Returns:
+        a pandas dataframe with the result of the query
+    """
+    chunks = list(ontology_stream(query, columns, batch_size))
+
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def domain_knowledge_processing_partitioning(
+    query, batch_size=None, aggregate=False, view=False
+):
     """This function is dataset specific and performs all needed
     operations for preparing the cases from OULAD data for selection.
     This function is tailored for the semi-automatic approach
@@ -70,6 +157,20 @@ def domain_knowledge_processing_partitioning(query):
         query:
             the SQL query for extracting domain knowledge from
             the ontology
+        batch_size:
+            if given, the result is streamed with a server-side
+            cursor in batches of this many rows (see ontology_stream).
+            Prefilled with None, which fetches all rows at once
+        aggregate:
+            a boolean value that tells if the weighting, the sum
+            per case and the enrollment check should be pushed into
+            the database (see AGGREGATE_QUERY), so only one row per
+            case is read-in. The result is the same. Prefilled with False
+        view:
+            a boolean value that tells if the query reads the per-case
+            rows of the domain_knowledge view (see
+            func.sql_load.query_domain_knowledge), which are used as
+            they are. Prefilled with False
 
     Returns:
         A pd dataframe which includes all the needed information
@@ -89,36 +190,46 @@ def domain_knowledge_processing_partitioning(query):
     logger = logging.getLogger("Domain_Knowledge_Manipulation")
     logger.setLevel(logging.DEBUG)
 
-    # importing the domain knowledge information
-    grades = ontology_import(query=query)
-
-    logger.debug("Ontology was loaded and has a length of %s", len(grades))
-
-    # converting to pd and dealing with dtypes
-    grades = pd.DataFrame(
-        grades,
-        columns=[
-            "code_module",
-            "code_presentation",
-            "id_student",
-            "id_assessment",
-            "weight",
-            "score",
-            "still_enrolled",
-        ],
-    )
-    grades["id_assessment"] = pd.to_numeric(grades["id_assessment"])
+    if aggregate or view:
+        if not view:
+            query = AGGREGATE_QUERY.format(query=query.strip().rstrip(";"))
+
+        if batch_size:
+            grades = ontology_frame(query, KNOWLEDGE_COLUMNS, batch_size)
+        else:
+            grades = ontology_import(query=query)
+            grades = pd.DataFrame(grades, columns=KNOWLEDGE_COLUMNS)
+
+        # matching the order and dtypes of the groupby done in pandas
+        grades = grades.sort_values("case:concept:name", ignore_index=True)
+        grades["score"] = grades["score"].astype(float)
+        grades["still_enrolled"] = grades["still_enrolled"].astype(bool)
+
+        logger.debug("The domain knowledge was aggregated: %s", grades.head(3))
+
+        return grades
+
+    if batch_size:
+        # streaming the domain knowledge information into pd
+        grades = ontology_frame(query, GRADE_COLUMNS, batch_size)
+
+        logger.debug("Ontology was loaded and has a length of %s", len(grades))
+    else:
+        # importing the domain knowledge information
+        grades = ontology_import(query=query)
+
+        logger.debug("Ontology was loaded and has a length of %s", len(grades))
+
+        # converting to pd and dealing with dtypes
+        grades = pd.DataFrame(grades, columns=GRADE_COLUMNS)
+        grades["id_assessment"] = pd.to_numeric(grades["id_assessment"])
 
     logger.debug("Creating new event_id for grades")
 
     keys = ["id_student", "code_module", "code_presentation"]
 
-    dummy = []
-    for i, rows in grades.iterrows():
-        # creating the case_id
-        dummy.append(case_id(rows, keys))
-
-    grades["case:concept:name"] = dummy
+    # creating the case_id
+    grades["case:concept:name"] = case_ids(grades, keys)
 
     # calculating the score for each assignment
     grades["score"] = grades["score"] * grades["weight"] / 100
@@ -159,61 +270,67 @@ def domain_knowledge_processing_partitioning(query):
     return grades
 
 
-def domain_knowledge_clustering(query_grades, query_vle):
-    from psycopg2 import Error
+def ontology_fetch(query=str, columns=list, batch_size=None):
+    """Reads the result of a query into a pandas dataframe, on
+    a connection of its own. Used for running independent queries
+    concurrently
 
+    Args:
+        query: the SQL query to be used
+        columns: the names of the columns returned by the query
+        batch_size: if given, the result is streamed in batches of
+                    this many rows (see ontology_stream). Prefilled
+                    with None, which fetches all rows at once
+
+    Returns:
+        a pandas dataframe with the result of the query
+    """
+    if batch_size:
+        return ontology_frame(query, columns, batch_size)
+
+    frame = pd.DataFrame(ontology_import(query=query), columns=columns)
+    if "id_assessment" in frame.columns:
+        frame["id_assessment"] = pd.to_numeric(frame["id_assessment"])
+
+    return frame
+
+
+def domain_knowledge_clustering(query_grades, query_vle, batch_size=None):
+    """This function reads the domain knowledge needed for the
+    clustering approach. The two queries run concurrently, each on
+    its own pooled connection, so the read-in takes as long as the
+    slowest of them
+
+    Args:
+        query_grades:
+            the SQL query for extracting the grades from the ontology
+        query_vle:
+            the SQL query for extracting the vle pages from the ontology
+        batch_size:
+            if given, the results are streamed with server-side
+            cursors in batches of this many rows (see ontology_stream).
+            Prefilled with None, which fetches all rows at once
+
+    Returns:
+        Two pd dataframes, one with the grades and one with the
+        activity type of every vle page
+    """
     logger = logging.getLogger("SQL_read_in")
     logger.setLevel(logging.DEBUG)
 
-    try:
-        # Connect to an existing database
-        connection = psycopg2.connect(
-            user="postgres",
-            password="thesis1",
-            host="localhost",
-            port="5433",
-            database="OULAD",
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        grades_future = executor.submit(
+            ontology_fetch, query_grades, GRADE_COLUMNS, batch_size
         )
+        vle_future = executor.submit(ontology_fetch, query_vle, VLE_COLUMNS, batch_size)
 
-        # Create a cursor to perform database operations
-        cursor = connection.cursor()
-        # Executing a SQL query
-        cursor.execute("SELECT version();")
-
-        # getting the SQL info
-        cursor.execute(query_grades)
-        grade_profile = cursor.fetchall()
-
-        cursor.execute(query_vle)
-        vle = cursor.fetchall()
-        logger.info(
-            "Information read-in. vle has length %s and grades have length %s",
-            len(grade_profile),
-            len(vle),
-        )
+        grade_profile = grades_future.result()
+        vle = vle_future.result()
 
-    except (Exception, Error) as error:
-        logger.error("Error while connecting to PostgreSQL %s", error)
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
-            logger.info("PostgreSQL connection is closed")
-
-    # loading the data to pd
-    grade_profile = pd.DataFrame(
-        grade_profile,
-        columns=[
-            "code_module",
-            "code_presentation",
-            "id_student",
-            "id_assessment",
-            "weight",
-            "score",
-            "still_enrolled",
-        ],
+    logger.info(
+        "Information read-in. vle has length %s and grades have length %s",
+        len(vle),
+        len(grade_profile),
     )
-    grade_profile["id_assessment"] = pd.to_numeric(grade_profile["id_assessment"])
 
-    vle = pd.DataFrame(vle, columns=["site", "activity_type"])
     return grade_profile, vle
@@ -0,0 +1,283 @@
+import configparser
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+logger = logging.getLogger("SQL_connection")
+logger.setLevel(logging.INFO)
+
+# settings used when neither the config file nor the environment sets them
+DEFAULTS = {
+    "database": "OULAD",
+    "user": "postgres",
+    "password": "thesis1",
+    "host": "localhost",
+    "port": "5433",
+    "minconn": "1",
+    "maxconn": "8",
+    # "postgres" or "duckdb" for the embedded backend
+    "backend": "postgres",
+    # the embedded backend reads the OULAD csv files (or their parquet
+    # copies) from data_path into the duckdb_database (":memory:" or a file)
+    "data_path": "data/",
+    "duckdb_database": ":memory:",
+}
+
+# OULAD identifiers stored as varchar in postgres, cast the same way
+# in the embedded backend so the queries return the same values
+EMBEDDED_VARCHAR = ["id_assessment", "id_student"]
+
+# config file read by default, its [postgresql] section holds the settings
+CONFIG_FILE = "database.ini"
+
+# the pool shared by every connection of the process
+_pool = None
+
+# the embedded database shared by every connection of the process
+_embedded = None
+_embedded_lock = threading.Lock()
+
+
+def database_config(config_file=None):
+    """Gets the settings for connecting to PostgreSQL or for
+    the embedded backend.
+
+    The defaults get overwritten by the [postgresql] section of
+    the config file and afterwards by the environment variables
+    OULAD_DB_<SETTING>, e.g. OULAD_DB_PORT
+
+    Args:
+        config_file: path to the config file. Prefilled with the
+                     OULAD_DB_CONFIG environment variable or
+                     database.ini
+
+    Returns:
+        A dict with the settings
+    """
+    settings = dict(DEFAULTS)
+
+    if config_file is None:
+        config_file = os.environ.get("OULAD_DB_CONFIG", CONFIG_FILE)
+
+    if os.path.exists(config_file):
+        parser = configparser.ConfigParser()
+        parser.read(config_file)
+        if parser.has_section("postgresql"):
+            settings.update(parser["postgresql"])
+
+    for key in settings:
+        value = os.environ.get("OULAD_DB_" + key.upper())
+        if value is not None:
+            settings[key] = value
+
+    return settings
+
+
+def connection_pool():
+    """Gets the connection pool of the process, creating it
+    on first use
+
+    Returns:
+        A psycopg2 ThreadedConnectionPool
+    """
+    global _pool
+
+    if _pool is None:
+        settings = database_config()
+        _pool = pool.ThreadedConnectionPool(
+            int(settings["minconn"]),
+            int(settings["maxconn"]),
+            database=settings["database"],
+            user=settings["user"],
+            password=settings["password"],
+            host=settings["host"],
+            port=settings["port"],
+        )
+        logger.info(
+            "Connection pool to %s:%s/%s created",
+            settings["host"],
+            settings["port"],
+            settings["database"],
+        )
+
+    return _pool
+
+
+def embedded_database():
+    """Gets the in-process DuckDB database of the embedded backend,
+    creating it and loading the OULAD tables on first use
+
+    Returns:
+        A duckdb connection
+    """
+    global _embedded
+
+    with _embedded_lock:
+        if _embedded is None:
+            import duckdb
+
+            settings = database_config()
+            _embedded = duckdb.connect(settings["duckdb_database"])
+            load_embedded_tables(_embedded, settings["data_path"])
+
+    return _embedded
+
+
+def embedded_source(table=str, data_path=str):
+    """Gets the file a table of the embedded backend is loaded from.
+    A parquet copy of the OULAD csv file (e.g. studentRegistration.parquet)
+    is preferred when it exists
+
+    Args:
+        table: the name of the table, see func.sql_preproc.preproc_specs
+        data_path: path to the folder with the OULAD files
+
+    Returns:
+        The name of the file
+    """
+    import func.sql_preproc
+
+    file = func.sql_preproc.preproc_specs[table]["file"]
+    columnar = os.path.splitext(file)[0] + ".parquet"
+
+    if os.path.exists(data_path + columnar):
+        return columnar
+
+    return file
+
+
+def load_embedded_tables(database, data_path=str):
+    """Loads the OULAD tables used by the domain knowledge queries
+    into the embedded database. The csv files (or their parquet
+    copies, see embedded_source) get preprocessed the same way as
+    for postgres (see func.sql_preproc).
+
+    Every load is recorded in the load_checkpoint table with the
+    checksum of its source, so with a database file a table is only
+    reloaded when its source or the preprocessing changed
+
+    Args:
+        database: the duckdb connection
+        data_path: path to the folder with the OULAD files
+    """
+    import func.sql_preproc
+    from func.utils import file_digest
+
+    database.execute(
+        "CREATE TABLE IF NOT EXISTS load_checkpoint ("
+        "table_name VARCHAR PRIMARY KEY, "
+        "source_checksum VARCHAR NOT NULL, "
+        "row_count BIGINT NOT NULL);"
+    )
+    checkpoints = database.execute(
+        "SELECT table_name, source_checksum FROM load_checkpoint;"
+    ).fetchall()
+    checkpoints = dict(checkpoints)
+
+    preproc_digest = file_digest(func.sql_preproc.__file__)
+
+    for table in func.sql_preproc.preproc_specs:
+        source = embedded_source(table, data_path)
+        checksum = file_digest(data_path + source) + preproc_digest
+
+        if checkpoints.get(table) == checksum:
+            continue
+
+        frame = func.sql_preproc.preproc_table(table, data_path, file=source)
+        for column in EMBEDDED_VARCHAR:
+            if column in frame.columns:
+                frame[column] = frame[column].astype(str)
+
+        database.register("oulad_frame", frame)
+        database.execute(
+            "CREATE OR REPLACE TABLE %s AS SELECT * FROM oulad_frame;" % table
+        )
+        database.unregister("oulad_frame")
+
+        database.execute(
+            "INSERT OR REPLACE INTO load_checkpoint VALUES (?, ?, ?);",
+            [table, checksum, len(frame)],
+        )
+        logger.info("Table %s loaded in the embedded database from %s", table, source)
+
+    # the domain knowledge view, recomputed on every read since duckdb
+    # has no materialized views
+    from func.sql_load import sql_domain_knowledge_select
+
+    database.execute(
+        "CREATE OR REPLACE VIEW domain_knowledge AS" + sql_domain_knowledge_select
+    )
+
+
+def is_embedded(conn):
+    """Tells if a connection belongs to the embedded backend
+
+    Args:
+        conn: a connection yielded by connection()
+
+    Returns:
+        True for a duckdb connection, False for a psycopg2 one
+    """
+    return not isinstance(conn, psycopg2.extensions.connection)
+
+
+def close_pool():
+    """Closes every connection of the pool and the embedded
+    database. The next connection creates them again from the
+    current settings
+    """
+    global _pool, _embedded
+
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+        logger.info("Connection pool closed")
+
+    with _embedded_lock:
+        if _embedded is not None:
+            _embedded.close()
+            _embedded = None
+            logger.info("Embedded database closed")
+
+
+@contextmanager
+def connection(autocommit=False):
+    """Borrows a warm connection from the pool and gives it back
+    afterwards. The transaction gets committed if no error occurs
+    and rolled back otherwise. With the embedded backend, a new
+    cursor of the in-process database is yielded instead
+
+    Args:
+        autocommit: a boolean value that tells if every statement
+                    should be committed on its own. Prefilled with False
+
+    Yields:
+        A psycopg2 connection, or a duckdb connection for the
+        embedded backend
+    """
+    if database_config()["backend"] == "duckdb":
+        # duckdb cursors are independent connections to the same database
+        conn = embedded_database().cursor()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    conn = connection_pool().getconn()
+
+    try:
+        conn.autocommit = autocommit
+        yield conn
+        if not autocommit:
+            conn.commit()
+    except Exception:
+        if not conn.closed and not autocommit:
+            conn.rollback()
+        raise
+    finally:
+        connection_pool().putconn(conn, close=bool(conn.closed))
@@ -1,8 +1,14 @@
+import hashlib
+import io
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # importing the module for preprocessing the data
 import func.sql_preproc
-import psycopg2
+import pandas as pd
+from func.sql_connection import connection, database_config
+from func.utils import file_digest
 
 logging.basicConfig()
 logger = logging.getLogger("SQL_upload")
@@ -44,88 +50,451 @@ CREATE TABLE IF NOT EXISTS registration (
 );
 """
 
-# loading data in the tables
-sql_load = """
+# the columns of every table and the file they are loaded from
+tables = {
+    "assessments": (
+        [
+            "code_module",
+            "code_presentation",
+            "id_assessment",
+            "assessment_type",
+            "date",
+            "weight",
+        ],
+        "assessments_clean.csv",
+    ),
+    "vle": (
+        ["id_site", "code_module", "code_presentation", "activity_type"],
+        "vle_clean.csv",
+    ),
+    "student_assessment": (
+        ["id_assessment", "id_student", "is_banked", "score"],
+        "studentAssessment_clean.csv",
+    ),
+    "registration": (
+        [
+            "code_module",
+            "code_presentation",
+            "id_student",
+            "date_registration",
+            "date_unregistration",
+        ],
+        "studentRegistration_clean.csv",
+    ),
+}
 
-COPY assessments(
-    code_module,
-    code_presentation,
-    id_assessment,
-    assessment_type, 
-    date,
-    weight
-    )
-FROM 'D:/Thesis/Work/github/event-log-partitioning/data/assessments_clean.csv'
-DELIMITER ','
-CSV HEADER;
-
-COPY vle(
-    id_site,
-    code_module,
-    code_presentation,
-    activity_type
-    )
-FROM 'D:/Thesis/Work/github/event-log-partitioning/data/vle_clean.csv'
-DELIMITER ','
-CSV HEADER;
-
-COPY student_assessment(
-    id_assessment,
-    id_student, 
-    is_banked,
-    score
-    )
-FROM 'D:/Thesis/Work/github/event-log-partitioning/data/studentAssessment_clean.csv'
-DELIMITER ','
-CSV HEADER;
-
-COPY registration(
-    code_module,
-    code_presentation,
-    id_student, 
-    date_registration,
-    date_unregistration
-    )
-FROM 'D:/Thesis/Work/github/event-log-partitioning/data/studentRegistration_clean.csv'
-DELIMITER ','
-CSV HEADER;
+# recording what was loaded in every table, so a load can be skipped when
+# the source data did not change
+sql_checkpoint = """
+
+CREATE TABLE IF NOT EXISTS load_checkpoint (
+    table_name varchar PRIMARY KEY,
+    source_checksum char(64) NOT NULL,
+    row_count bigint NOT NULL,
+    loaded_at timestamp NOT NULL DEFAULT now()
+);
+"""
+
+sql_checkpoint_read = """
+SELECT source_checksum, row_count FROM load_checkpoint WHERE table_name = %s;
+"""
+
+sql_checkpoint_write = """
+INSERT INTO load_checkpoint (table_name, source_checksum, row_count)
+VALUES (%s, %s, %s)
+ON CONFLICT (table_name) DO UPDATE SET
+    source_checksum = EXCLUDED.source_checksum,
+    row_count = EXCLUDED.row_count,
+    loaded_at = now();
+"""
+
+# loading data in the tables, streamed from the client
+sql_copy = "COPY {table}({columns}) FROM STDIN WITH (FORMAT csv, HEADER true);"
+sql_copy_frame = "COPY {table}({columns}) FROM STDIN WITH (FORMAT csv);"
+
+# keying and indexing the columns used by the joins and filters of the domain
+# knowledge queries and refreshing the planner statistics after the load
+sql_index = """
+
+CREATE UNIQUE INDEX IF NOT EXISTS assessments_key
+    ON assessments (id_assessment);
+CREATE INDEX IF NOT EXISTS assessments_code_presentation
+    ON assessments (code_presentation);
+
+CREATE UNIQUE INDEX IF NOT EXISTS vle_key
+    ON vle (id_site);
+CREATE INDEX IF NOT EXISTS vle_code_presentation
+    ON vle (code_presentation);
+
+CREATE UNIQUE INDEX IF NOT EXISTS student_assessment_key
+    ON student_assessment (id_assessment, id_student);
+CREATE INDEX IF NOT EXISTS student_assessment_id_student
+    ON student_assessment (id_student);
+
+CREATE UNIQUE INDEX IF NOT EXISTS registration_key
+    ON registration (id_student, code_module, code_presentation);
+
+ANALYZE assessments;
+ANALYZE vle;
+ANALYZE student_assessment;
+ANALYZE registration;
+"""
+
+# the per-case domain knowledge (final grade and drop out) of every presentation
+sql_domain_knowledge_select = """
+
+SELECT
+    grades.id_student || '_' || grades.code_module || '_' || grades.code_presentation
+        AS case_id,
+    grades.code_presentation,
+    COALESCE(SUM(grades.score * grades.weight / 100), 0) AS score,
+    COUNT(*) FILTER (WHERE grades.still_enrolled) = COUNT(*) AS still_enrolled
+
+FROM (
+    SELECT
+        assessments.code_module,
+        assessments.code_presentation,
+        student_assessment.id_student,
+        assessments.id_assessment,
+        assessments.weight,
+        student_assessment.score,
+        registration.date_unregistration as still_enrolled
+
+    FROM student_assessment
+
+    JOIN assessments ON student_assessment.id_assessment = assessments.id_assessment
+
+    LEFT JOIN registration ON student_assessment.id_student = registration.id_student
+        AND assessments.code_module = registration.code_module
+        AND assessments.code_presentation = registration.code_presentation
+) AS grades
+
+GROUP BY 1, 2
+"""
 
+# the domain knowledge kept as a materialized view, so it is only
+# recomputed when refreshed
+sql_domain_knowledge = (
+    "CREATE MATERIALIZED VIEW IF NOT EXISTS domain_knowledge AS"
+    + sql_domain_knowledge_select
+    + """
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS domain_knowledge_case_id
+    ON domain_knowledge (case_id);
+CREATE INDEX IF NOT EXISTS domain_knowledge_code_presentation
+    ON domain_knowledge (code_presentation);
 """
+)
+
+# reading the domain knowledge of the 2014 presentations from the view
+query_domain_knowledge = """
+
+SELECT case_id, score, still_enrolled
+FROM domain_knowledge
+WHERE code_presentation = '2014J' OR code_presentation = '2014B'
+
+"""
+
+# tells if the domain knowledge view is created and refreshed with the load
+DOMAIN_KNOWLEDGE_VIEW = True
+
+# tells if the preprocessed data is sent straight to postgres instead of
+# going through the _clean.csv files, by default
+IN_MEMORY = True
 
 
 def postgres_connect():
-    """A function that connects to postgres
-    with my credentials
+    """A function that borrows an autocommit connection
+    from the shared pool (see func.sql_connection)
 
     Returns:
-        Returns the conn object to be
-        used to load tables
+        A context manager yielding the conn object to be
+        used to load tables. The conn goes back to the pool
+        at the end of the with block
 
     """
-    # connecting to postgres
-    conn = psycopg2.connect(
-        database="OULAD",
-        user="postgres",
-        password="thesis1",
-        host="127.0.0.1",
-        port="5433",
+    logger.info("Postgres Connection Successfull")
+
+    return connection(autocommit=True)
+
+
+def copy_table(table=str, data_path=str, truncate=False):
+    """Streams one csv file from the client into its table
+    through COPY FROM STDIN, on its own pooled connection
+
+    Args:
+        table: the name of the table to be loaded
+        data_path: path to the folder with the cleaned csv files
+        truncate: a boolean value that tells if the rows already in
+                  the table are removed, in the same transaction as
+                  the load. Prefilled with False
+
+    Returns:
+        The number of rows loaded
+    """
+    columns, file = tables[table]
+    sql = sql_copy.format(table=table, columns=", ".join(columns))
+
+    start = time.perf_counter()
+    with connection() as conn:
+        with conn.cursor() as cursor, open(data_path + file, encoding="utf-8") as f:
+            if truncate:
+                cursor.execute("TRUNCATE %s;" % table)
+            cursor.copy_expert(sql, f)
+            rows = cursor.rowcount
+    seconds = time.perf_counter() - start
+
+    logger.info(
+        "%s: %s rows loaded in %.2fs (%.0f rows/s)",
+        table,
+        rows,
+        seconds,
+        rows / seconds if seconds else 0,
     )
 
-    conn.autocommit = True
+    return rows
 
-    logger.info("Postgres Connection Successfull")
 
-    return conn
+def copy_frame(table=str, frame=pd.DataFrame, chunksize=100000, truncate=False):
+    """Streams a preprocessed dataframe into its table through
+    COPY FROM STDIN. The rows are sent in chunks written to an
+    in-memory buffer, so no csv file is written to disk
+
+    Args:
+        table: the name of the table to be loaded
+        frame: the preprocessed dataframe
+        chunksize: the number of rows buffered at once
+        truncate: a boolean value that tells if the rows already in
+                  the table are removed, in the same transaction as
+                  the load. Prefilled with False
+
+    Returns:
+        The number of rows loaded
+    """
+    columns, _ = tables[table]
+    sql = sql_copy_frame.format(table=table, columns=", ".join(columns))
+    frame = frame[columns]
+
+    rows = 0
+    start = time.perf_counter()
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            if truncate:
+                cursor.execute("TRUNCATE %s;" % table)
+
+            for i in range(0, len(frame), chunksize):
+                buffer = io.StringIO()
+                frame.iloc[i : i + chunksize].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+
+                cursor.copy_expert(sql, buffer)
+                rows += cursor.rowcount
+    seconds = time.perf_counter() - start
+
+    logger.info(
+        "%s: %s rows loaded in %.2fs (%.0f rows/s)",
+        table,
+        rows,
+        seconds,
+        rows / seconds if seconds else 0,
+    )
+
+    return rows
+
+
+def load_frames(data_path=str, workers=4, selection=None, truncate=False):
+    """Preprocesses the tables in memory and loads them in
+    parallel, every table over a separate connection, without
+    writing the _clean.csv files
+
+    Args:
+        data_path: path to the folder with the OULAD csv files
+        workers: the number of tables loaded at the same time
+        selection: the tables to be loaded. Prefilled with None,
+                   which loads all of them
+        truncate: see copy_frame
+
+    Returns:
+        A dict with the number of rows loaded in every table
+    """
+    if selection is None:
+        selection = list(tables)
+
+    def preproc_and_copy(table):
+        frame = func.sql_preproc.preproc_table(table, data_path)
+        return copy_frame(table, frame, truncate=truncate)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            table: executor.submit(preproc_and_copy, table) for table in selection
+        }
+
+    return {table: future.result() for table, future in futures.items()}
+
+
+def load_tables(data_path=str, workers=4, selection=None, truncate=False):
+    """Loads the tables in parallel, every table over a
+    separate connection
+
+    Args:
+        data_path: path to the folder with the cleaned csv files
+        workers: the number of tables loaded at the same time
+        selection: the tables to be loaded. Prefilled with None,
+                   which loads all of them
+        truncate: see copy_table
+
+    Returns:
+        A dict with the number of rows loaded in every table
+    """
+    if selection is None:
+        selection = list(tables)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            table: executor.submit(copy_table, table, data_path, truncate)
+            for table in selection
+        }
+
+    return {table: future.result() for table, future in futures.items()}
+
+
+def create_indexes(conn):
+    """Creates the indexes of the tables and refreshes their
+    statistics. Meant to be run after the data was loaded
+
+    Args:
+        conn: an open connection to postgres
+    """
+    conn.cursor().execute(sql_index)
+    logger.info("Indexes created and tables analyzed")
+
+
+def refresh_domain_knowledge(conn, concurrently=False):
+    """Creates the domain_knowledge materialized view if it does
+    not exist yet and recomputes it from the current tables. A
+    concurrent refresh needs the view to be populated already
+
+    Args:
+        conn: an open connection to postgres
+        concurrently: a boolean value that tells if the view
+                      should stay readable during the refresh.
+                      Prefilled with False
+    """
+    cursor = conn.cursor()
+    cursor.execute(sql_domain_knowledge)
+
+    if concurrently:
+        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY domain_knowledge;")
+    else:
+        cursor.execute("REFRESH MATERIALIZED VIEW domain_knowledge;")
+
+    logger.info("Domain knowledge view refreshed")
+
+
+def source_checksum(table=str, data_path=str):
+    """Fingerprints the data a table is loaded from: the content
+    of its OULAD csv file and the code of the preprocessing
+
+    Args:
+        table: the name of the table
+        data_path: path to the folder with the OULAD csv files
+
+    Returns:
+        The hex digest of the source of the table
+    """
+    file = func.sql_preproc.preproc_specs[table]["file"]
+
+    digest = hashlib.sha256()
+    digest.update(file_digest(data_path + file).encode())
+    digest.update(file_digest(func.sql_preproc.__file__).encode())
+
+    return digest.hexdigest()
+
+
+def bootstrap(data_path="data/", in_memory=IN_MEMORY, force=False, workers=4):
+    """Creates and loads the OULAD tables in postgres, skipping the
+    tables that are already loaded.
+
+    Every load is recorded in the load_checkpoint table with the
+    checksum of its source and its row count. A table is only
+    (re)loaded when the checksum changed or its row count does not
+    match anymore, and it is truncated in the same transaction, so
+    running the bootstrap again never duplicates rows. The
+    domain_knowledge view is refreshed after every load, and created
+    if it is missing even when no table needs to be loaded.
+
+    Args:
+        data_path: path to the folder with the OULAD csv files
+        in_memory: a boolean value that tells if the preprocessed
+                   data is sent straight to postgres instead of going
+                   through the _clean.csv files. Prefilled with IN_MEMORY
+        force: a boolean value that tells if all the tables are
+               reloaded anyway. Prefilled with False
+        workers: the number of tables loaded at the same time
+
+    Returns:
+        A dict with the number of rows loaded in every reloaded table
+    """
+    if database_config()["backend"] != "postgres":
+        logger.info("The embedded backend loads the tables itself, nothing to do")
+        return {}
+
+    checksums = {table: source_checksum(table, data_path) for table in tables}
+
+    pending = []
+    with postgres_connect() as conn:
+        cursor = conn.cursor()
+        # creating the sql tables
+        cursor.execute(sql_create)
+        cursor.execute(sql_checkpoint)
+
+        for table in tables:
+            cursor.execute(sql_checkpoint_read, (table,))
+            checkpoint = cursor.fetchone()
+            cursor.execute("SELECT count(*) FROM %s;" % table)
+            rows = cursor.fetchone()[0]
+
+            if force or checkpoint != (checksums[table], rows):
+                pending.append(table)
+
+        # the view may be missing even if all the tables are loaded,
+        # e.g. when DOMAIN_KNOWLEDGE_VIEW was turned on after the load
+        cursor.execute("SELECT to_regclass('domain_knowledge');")
+        view_missing = cursor.fetchone()[0] is None
+
+    if not pending:
+        if DOMAIN_KNOWLEDGE_VIEW and view_missing:
+            with postgres_connect() as conn:
+                refresh_domain_knowledge(conn)
+
+        logger.info("All tables are already loaded, nothing to do")
+        return {}
+
+    logger.info("Tables to be loaded: %s", pending)
+
+    if in_memory:
+        loaded = load_frames(data_path, workers, selection=pending, truncate=True)
+    else:
+        for table in pending:
+            func.sql_preproc.preproc(
+                data_path=data_path, **func.sql_preproc.preproc_specs[table]
+            )
+        loaded = load_tables(data_path, workers, selection=pending, truncate=True)
+    logger.info("Data was sent to Postgres")
+
+    with postgres_connect() as conn:
+        cursor = conn.cursor()
+        for table, rows in loaded.items():
+            cursor.execute(sql_checkpoint_write, (table, checksums[table], rows))
+
+        create_indexes(conn)
 
+        if DOMAIN_KNOWLEDGE_VIEW:
+            refresh_domain_knowledge(conn)
 
-# creating the sql tables
-conn = postgres_connect()
+    return loaded
 
-# running the SQL Querry
-conn.cursor().execute(sql_create)
-conn.cursor().execute(sql_load)
-logger.info("Data was sent to Postgres")
 
-# closing the SQl connection
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    bootstrap()
@@ -1,9 +1,9 @@
-import datetime
 import logging
 
-import numpy as np
 import pandas as pd
 
+from func.utils import presentation_start
+
 logging.basicConfig()
 logger_general = logging.getLogger("Data_Preprocessing")
 logger_general.setLevel(logging.INFO)
@@ -27,30 +27,53 @@ def time_conversion(date, date_start):
         The date of the event in datetime format
     """
 
-    year_start = int(date_start[0:4])
-
-    if date_start[4] == "B":
-        month_start = 2
-    else:
-        month_start = 10
-
     if "-2014" in str(date):
         return date
 
-    x = datetime.datetime(year_start, month_start, 1)
-
-    ts = pd.Timestamp(x)
+    ts = presentation_start(date_start)
 
     do = pd.tseries.offsets.DateOffset(n=int(date))
 
     return ts + do
 
 
-def preproc(
-    data_path, file, output, registration=False, time_column=None, columns_drop=None
-):
+def time_conversions(dates, date_starts):
+    """
+    Columnar version of time_conversion. The start date of every
+    presentation is resolved only once through a lookup table and the
+    day offsets get added to the whole column at once. Dates that
+    were already transformed to datetime are kept as they are
+
+    Args:
+        dates:
+            pd series with the number of days since the
+            start of the course until the event
+        date_starts:
+            pd series with the presentation code of every event
+
+    Returns:
+        A pd series with the dates of the events, aligned with
+        the index of dates
+    """
+    converted = dates.astype(str).str.contains("-2014", regex=False)
+    pending = ~converted
+
+    lookup = {code: presentation_start(code) for code in date_starts[pending].unique()}
+
+    starts = date_starts[pending].map(lookup).astype("datetime64[ns]")
+    offsets = pd.to_timedelta(pd.to_numeric(dates[pending]).astype("int64"), unit="D")
+
+    result = dates.astype(object)
+    result[pending] = starts + offsets
+
+    return result
 
+
+def preproc_frame(
+    data_path, file, registration=False, time_column=None, columns_drop=None
+):
     """This function prepares the data for sending to PostgreSQL
+    and keeps it in memory
 
     The function reads in the data and afterwards performs general
     preprocessing for each of the datasets, as well as individual
@@ -60,9 +83,8 @@ def preproc(
         data_path:
             path to data folder
         file:
-            file name to be preprocessed
-        output:
-            file name where the result gets saved
+            file name to be preprocessed, a csv file or a parquet
+            file with the same columns
         registration:
             Boolean value that tells the function if the
             "studentRegistration" table is being preprocessed or
@@ -76,12 +98,14 @@ def preproc(
             A list with columns that need to be dropped
 
     Return:
-        It does not return anything, but it sends the output
-        to a csv file.
+        The preprocessed pandas dataframe
 
     """
 
-    data = pd.read_csv(data_path + file)
+    if file.endswith(".parquet"):
+        data = pd.read_parquet(data_path + file)
+    else:
+        data = pd.read_csv(data_path + file)
     logger_general.debug("File %s was successfullt read", file)
 
     if columns_drop:
@@ -99,81 +123,130 @@ def preproc(
             inplace=True,
         )
         logger_general.debug("A registration is being processed for file %s", file)
-        data["date_unregistration"] = np.isnan(data["date_unregistration"])
+        data["date_unregistration"] = data["date_unregistration"].isna()
 
     else:
         data.dropna(inplace=True)
 
     if time_column:
         logger_general.debug("Time column is being processed for file %s", file)
-        time_dummy = []
-        for i, rows in data.iterrows():
-            # creating the case_id
-            time_dummy.append(
-                time_conversion(rows[time_column], rows["code_presentation"])
-            )
-
-        data[time_column] = time_dummy
+        data[time_column] = time_conversions(
+            data[time_column], data["code_presentation"]
+        )
 
         data[time_column] = pd.to_datetime(data[time_column])
         logger_general.debug("Timestamps successfully converted for file %s", file)
 
+    return data
+
+
+def preproc(
+    data_path, file, output, registration=False, time_column=None, columns_drop=None
+):
+
+    """This function prepares the data for sending to PostgreSQL
+
+    The function preprocesses the data with preproc_frame and saves
+    the result in a csv file
+
+    Args:
+        data_path:
+            path to data folder
+        file:
+            file name to be preprocessed
+        output:
+            file name where the result gets saved
+        registration:
+            see preproc_frame
+        time_column:
+            see preproc_frame
+        columns_drop:
+            see preproc_frame
+
+    Return:
+        It does not return anything, but it sends the output
+        to a csv file.
+
+    """
+    data = preproc_frame(
+        data_path=data_path,
+        file=file,
+        registration=registration,
+        time_column=time_column,
+        columns_drop=columns_drop,
+    )
+
     logger_general.debug("Data is parsed to csv in file %s", output)
     data.to_csv(data_path + output, sep=",", index=False)
 
     return
 
 
-data_path = "data/"
-
-# running the function for each dataset that needs preprocessing
-preproc(
-    data_path=data_path,
-    file="assessments.csv",
-    time_column="date",
-    output="assessments_clean.csv",
-)
-logger_general.info(
-    "%s has been preprocessed and saved in %s",
-    "assessments.csv",
-    "assessments_clean.csv",
-)
-
-
-preproc(
-    data_path=data_path,
-    file="vle.csv",
-    columns_drop=["week_from", "week_to"],
-    time_column=None,
-    output="vle_clean.csv",
-)
-logger_general.info(
-    "%s has been preprocessed and saved in %s", "vle.csv", "vle_clean.csv"
-)
-
-
-preproc(
-    data_path=data_path,
-    file="studentAssessment.csv",
-    columns_drop=["date_submitted"],
-    time_column=None,
-    output="studentAssessment_clean.csv",
-)
-logger_general.info(
-    "%s has been preprocessed and saved in %s",
-    "studentAssessment.csv",
-    "studentAssessment_clean.csv",
-)
-
-preproc(
-    data_path=data_path,
-    file="studentRegistration.csv",
-    time_column="date_registration",
-    registration=True,
-    output="studentRegistration_clean.csv",
-)
-logger_general.info(
-    "%s has been preprocessed and saved in %s",
-    "studentRegistration.csv",
-    "studentRegistration_clean.csv",
-)
+# the preprocessing of every dataset, by the table it gets loaded in
+preproc_specs = {
+    "assessments": {
+        "file": "assessments.csv",
+        "time_column": "date",
+        "output": "assessments_clean.csv",
+    },
+    "vle": {
+        "file": "vle.csv",
+        "columns_drop": ["week_from", "week_to"],
+        "output": "vle_clean.csv",
+    },
+    "student_assessment": {
+        "file": "studentAssessment.csv",
+        "columns_drop": ["date_submitted"],
+        "output": "studentAssessment_clean.csv",
+    },
+    "registration": {
+        "file": "studentRegistration.csv",
+        "time_column": "date_registration",
+        "registration": True,
+        "output": "studentRegistration_clean.csv",
+    },
+}
+
+
+def preproc_table(table, data_path, file=None):
+    """Preprocesses the dataset of one table in memory
+
+    Args:
+        table:
+            the name of the table, see preproc_specs
+        data_path:
+            path to data folder
+        file:
+            file name read instead of the one of the spec, e.g. a
+            parquet copy of the dataset. Prefilled with None
+
+    Return:
+        The preprocessed pandas dataframe
+    """
+    spec = dict(preproc_specs[table])
+    spec.pop("output")
+
+    if file is not None:
+        spec["file"] = file
+
+    return preproc_frame(data_path=data_path, **spec)
+
+
+def preproc_all(data_path):
+    """Runs preproc for each dataset that needs preprocessing,
+    saving the results in the _clean.csv files
+
+    Args:
+        data_path:
+            path to data folder
+    """
+    for spec in preproc_specs.values():
+        preproc(data_path=data_path, **spec)
+        logger_general.info(
+            "%s has been preprocessed and saved in %s", spec["file"], spec["output"]
+        )
+
+
+if __name__ == "__main__":
+    # running the function for each dataset that needs preprocessing
+    preproc_all(data_path="data/")
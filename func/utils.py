@@ -0,0 +1,46 @@
+import datetime
+import hashlib
+
+import pandas as pd
+
+
+def presentation_start(date_start):
+    """
+    Gets the start date of a course presentation. "B" presentations
+    start in February and "J" presentations start in October
+
+    Args:
+        date_start:
+            the code of the presentation, e.g. 2014J
+
+    Returns:
+        The start date of the presentation as a pd Timestamp
+    """
+    year_start = int(date_start[0:4])
+
+    if date_start[4] == "B":
+        month_start = 2
+    else:
+        month_start = 10
+
+    return pd.Timestamp(datetime.datetime(year_start, month_start, 1))
+
+
+def file_digest(path, block_size=1048576):
+    """Computes the sha256 digest of the content of a file,
+    reading it block by block
+
+    Args:
+        path: the path to the file
+        block_size: the number of bytes read at once
+
+    Returns:
+        The hex digest of the file
+    """
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
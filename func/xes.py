@@ -0,0 +1,258 @@
+import gzip
+import logging
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pandas as pd
+
+XES_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<log xes.version="1849-2016" xes.features="nested-attributes" openxes.version="1.0RC7">
+  <extension name="Time" prefix="time" uri="http://www.xes-standard.org/time.xesext"/>
+  <extension name="Concept" prefix="concept" uri="http://www.xes-standard.org/concept.xesext"/>
+"""
+
+XES_FOOTER = "</log>\n"
+
+
+def xes_type(column):
+    """Gets the XES attribute type of a dataframe column
+
+    Args:
+        column: a pd series from the event log
+
+    Returns:
+        The XES tag used for the values of the column
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return "date"
+    if pd.api.types.is_bool_dtype(column):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(column):
+        return "int"
+    if pd.api.types.is_float_dtype(column):
+        return "float"
+    return "string"
+
+
+def xes_values(tag, values):
+    """Formats a block of column values as XES attribute values.
+    Missing values are returned as None, since XES leaves them out
+
+    Args:
+        tag: the XES type of the values
+        values: a numpy array with the values
+
+    Returns:
+        A list with the formatted values
+    """
+    if tag == "date":
+        dates = np.datetime_as_string(values, unit="ms")
+        return [None if d == "NaT" else d + "+00:00" for d in dates]
+    if tag == "boolean":
+        return ["true" if v else "false" for v in values]
+    if tag == "int":
+        return [None if pd.isna(v) else str(int(v)) for v in values]
+    if tag == "float":
+        return [None if pd.isna(v) else repr(float(v)) for v in values]
+    return [None if pd.isna(v) else str(v) for v in values]
+
+
+def xes_export(event_log, data_path=str, compress=False):
+    """This function streams an event log dataframe to a .xes file.
+
+    The events are grouped by case and sorted by time through an
+    index array and get written trace by trace, so no intermediate
+    pm4py EventLog is built. Columns starting with "case:" become
+    trace attributes, all the others event attributes
+
+    Args:
+        event_log: the event log in a pandas dataframe
+        data_path: the path to the .xes file
+        compress: a boolean value that tells if the file should
+                  be gzip compressed. Files ending in .gz are always
+                  compressed. Prefilled with False
+    """
+    logger = logging.getLogger("xes_export")
+    logger.setLevel(logging.DEBUG)
+
+    # cases keep the order of their first event
+    case_codes, case_names = pd.factorize(event_log["case:concept:name"])
+
+    timestamps = event_log["time:timestamp"]
+    if getattr(timestamps.dt, "tz", None) is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+
+    # grouping the events by case and sorting them by time without copying the df
+    order = np.lexsort((timestamps.to_numpy(), case_codes))
+    if len(order) > 0:
+        bounds = np.flatnonzero(np.diff(case_codes[order])) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(order)]))
+    else:
+        starts, ends = [], []
+
+    attributes = []
+    for column in event_log.columns:
+        # internal pm4py columns such as @@index are not exported
+        if column.startswith("@@"):
+            continue
+        values = timestamps if column == "time:timestamp" else event_log[column]
+        attributes.append((column, xes_type(values), values.to_numpy()))
+
+    trace_attributes = [a for a in attributes if a[0].startswith("case:")]
+    event_attributes = [a for a in attributes if not a[0].startswith("case:")]
+
+    if compress or data_path.endswith(".gz"):
+        file = gzip.open(data_path, "wt", encoding="utf-8")
+    else:
+        file = open(data_path, "w", encoding="utf-8")
+
+    with file:
+        file.write(XES_HEADER)
+
+        for start, end in zip(starts, ends):
+            events = order[start:end]
+            lines = ["  <trace>\n"]
+
+            for column, tag, values in trace_attributes:
+                value = xes_values(tag, values[events[:1]])[0]
+                if value is not None:
+                    lines.append(
+                        "    <%s key=%s value=%s/>\n"
+                        % (tag, quoteattr(column[5:]), quoteattr(value))
+                    )
+
+            block = [
+                (column, tag, xes_values(tag, values[events]))
+                for column, tag, values in event_attributes
+            ]
+            for i in range(len(events)):
+                lines.append("    <event>\n")
+                for column, tag, formatted in block:
+                    if formatted[i] is not None:
+                        lines.append(
+                            "      <%s key=%s value=%s/>\n"
+                            % (tag, quoteattr(column), quoteattr(formatted[i]))
+                        )
+                lines.append("    </event>\n")
+
+            lines.append("  </trace>\n")
+            file.write("".join(lines))
+
+        file.write(XES_FOOTER)
+
+    logger.info("%s traces were exported to %s", len(case_names), data_path)
+
+
+def xes_value(tag, value):
+    """Converts the value of a XES attribute to a python value.
+    Dates are kept as strings and get converted per column
+
+    Args:
+        tag: the XES type of the attribute
+        value: the value of the attribute as found in the file
+
+    Returns:
+        The typed value
+    """
+    if tag == "int":
+        return int(value)
+    if tag == "float":
+        return float(value)
+    if tag == "boolean":
+        return value.lower() == "true"
+    return value
+
+
+def xes_import(data_path=str):
+    """This function streams a .xes file directly into a pandas
+    dataframe, without building a pm4py EventLog.
+
+    The elements are cleared as soon as they were read, and every
+    attribute is collected in its own typed column. Trace attributes
+    get the "case:" prefix and the events of every trace are sorted
+    by time, as done by the pm4py importer
+
+    Args:
+        data_path: the path to the .xes file (.xes.gz files are
+                   decompressed on the fly)
+
+    Returns:
+        The event log in a pandas dataframe
+    """
+    import xml.etree.ElementTree as ET
+
+    logger = logging.getLogger("xes_import")
+    logger.setLevel(logging.DEBUG)
+
+    # column -> (rows where the attribute appears, values, xes type)
+    columns = {}
+    traces = []
+    trace_attributes = {}
+    trace_start = 0
+    events = 0
+    container = []
+    root = None
+
+    if data_path.endswith(".gz"):
+        file = gzip.open(data_path, "rb")
+    else:
+        file = open(data_path, "rb")
+
+    with file:
+        for action, elem in ET.iterparse(file, events=("start", "end")):
+            tag = elem.tag.rpartition("}")[2]
+
+            if action == "start":
+                if root is None:
+                    root = elem
+                container.append(tag)
+                if tag == "trace":
+                    trace_attributes = {}
+                    trace_start = events
+                continue
+
+            container.pop()
+            parent = container[-1] if container else None
+
+            if tag == "event" and parent == "trace":
+                events += 1
+                elem.clear()
+
+            elif tag == "trace":
+                for key, (attr_tag, value) in trace_attributes.items():
+                    rows, values, _ = columns.setdefault(
+                        "case:" + key, ([], [], attr_tag)
+                    )
+                    rows.extend(range(trace_start, events))
+                    values.extend([value] * (events - trace_start))
+                # the number of events of every trace
+                traces.append(events - trace_start)
+                # dropping the finished trace from the root as well
+                root.clear()
+
+            elif parent == "event" and "key" in elem.attrib:
+                rows, values, _ = columns.setdefault(elem.get("key"), ([], [], tag))
+                rows.append(events)
+                values.append(xes_value(tag, elem.get("value")))
+
+            elif parent == "trace" and "key" in elem.attrib:
+                value = xes_value(tag, elem.get("value"))
+                trace_attributes[elem.get("key")] = (tag, value)
+
+    log_pd = pd.DataFrame(index=pd.RangeIndex(events))
+    for column, (rows, values, tag) in columns.items():
+        if tag == "date":
+            values = pd.to_datetime(values, utc=True)
+        log_pd[column] = pd.Series(values, index=rows)
+
+    # sorting the events of every trace by time, keeping the order of the traces
+    if "time:timestamp" in log_pd.columns and events > 0:
+        trace_index = np.repeat(np.arange(len(traces)), traces)
+        timestamps = log_pd["time:timestamp"].dt.tz_localize(None).to_numpy()
+        order = np.lexsort((timestamps, trace_index))
+        log_pd = log_pd.take(order).reset_index(drop=True)
+
+    logger.info("%s traces and %s events read from %s", len(traces), events, data_path)
+
+    return log_pd
@@ -5,7 +5,6 @@ import func.clustering_profiles as profiles
 
 # importing the module for reading from sql
 import func.ontology_processing as ontology
-import func.sql_load
 import graphviz
 import pandas as pd
 import pm4py
@@ -15,9 +14,10 @@ from func.event_log import event_log_import
 from func.kmeans import kmeans_apply, preparing_kmeans
 
 # creating the tables in SQL
+from func.sql_load import bootstrap
 
 
-def partition_event_log(data):
+def partition_event_log(data, log):
     data_cl_0 = data[data.cluster == 0]
     data_cl_0 = data_cl_0["case:concept:name"]
 
@@ -52,15 +52,18 @@ logger_general.setLevel(logging.DEBUG)
 
 # obtaining an event log which can be either generated from scratch or read-in
 # log = ev.event_log_generation() # generates a new event log from OULAD data
-log, log_pd = event_log_import(
-    data_path="simple_event_log.xes", pandas=True
-)  # reads the event log
-logger_general.info("The available event log has the length %s", len(log))
+log_pd = event_log_import(
+    data_path="simple_event_log.feather", pandas=True, log_object=False
+)  # reads the event log only as a dataframe
+logger_general.info(
+    "The available event log has the length %s",
+    log_pd["case:concept:name"].nunique(),
+)
 
 query_grades = """
 
-SELECT DISTINCT
-	registration.code_module,
+SELECT
+	assessments.code_module,
 	assessments.code_presentation,
 	student_assessment.id_student,
 	assessments.id_assessment,
@@ -73,6 +76,8 @@ FROM student_assessment
 JOIN assessments ON student_assessment.id_assessment = assessments.id_assessment
 
 LEFT JOIN registration ON student_assessment.id_student = registration.id_student
+	AND assessments.code_module = registration.code_module
+	AND assessments.code_presentation = registration.code_presentation
 
 WHERE assessments.code_presentation = '2014J' OR assessments.code_presentation = '2014B'
 
@@ -86,8 +91,8 @@ WHERE vle.code_presentation = '2014J' OR vle.code_presentation = '2014B'
 
 """
 
-perf_profile = profiles.profile_performance(log_pd)
-activity_profile = profiles.profile_activity(log_pd)
+# creating the tables in SQL, skipped when they are already loaded
+bootstrap(data_path="data/")
 
 # obtaining the domain knowledge information
 grade_profile, vle = ontology.domain_knowledge_clustering(query_grades, query_vle)
@@ -95,18 +100,20 @@ logger_general.info(
     "The domain knowledge was obtained: \n %s \n %s", grade_profile.head(3), vle.head(3)
 )
 grade_profile = profiles.profile_grade(grade_profile)
-vle_profile = profiles.profile_vle(vle, log_pd)
+
+# the event log profiles share one grouping of the log by case
+log_profiles = profiles.profile_log(log_pd, vle=vle)
 
 data, X = preparing_kmeans(
-    activity_profile=activity_profile,
-    performance_profile=perf_profile,
+    activity_profile=log_profiles["activity"],
+    performance_profile=log_profiles["performance"],
     grade_profile=grade_profile,
-    vle_profile=vle_profile,
+    vle_profile=log_profiles["vle"],
 )
 
 data = kmeans_apply(data=data, X=X, clusters=2)
 
-log_0, log_1 = partition_event_log(data)
+log_0, log_1 = partition_event_log(data, log_pd)
 print(log_0, log_1)
 from pm4py.algo.discovery.heuristics import algorithm as heuristics_miner
 from pm4py.visualization.heuristics_net import visualizer as hn_visualizer
@@ -13,14 +13,17 @@ pd.options.mode.chained_assignment = None
 # loading the module for preprocessing and extracting the domain knowledge
 import func.ontology_processing as ontology
 # creating the ontology in sql
-import func.sql_load
+from func.sql_load import DOMAIN_KNOWLEDGE_VIEW, bootstrap, query_domain_knowledge
 # loading the module for event log generation and reading in
 from func.event_log import event_log_generation, event_log_import
 
+# the grades over the base tables, the domain_knowledge view holds the same
+# join already aggregated per case. Used with aggregate=True when the view
+# is turned off (see func.sql_load.DOMAIN_KNOWLEDGE_VIEW)
 query = """
 
-SELECT DISTINCT
-	registration.code_module,
+SELECT
+	assessments.code_module,
 	assessments.code_presentation,
 	student_assessment.id_student,
 	assessments.id_assessment,
@@ -33,6 +36,8 @@ FROM student_assessment
 JOIN assessments ON student_assessment.id_assessment = assessments.id_assessment
 
 LEFT JOIN registration ON student_assessment.id_student = registration.id_student
+	AND assessments.code_module = registration.code_module
+	AND assessments.code_presentation = registration.code_presentation
 
 WHERE assessments.code_presentation = '2014J' OR assessments.code_presentation = '2014B'
 
@@ -104,11 +109,21 @@ logger_general.setLevel(logging.DEBUG)
 # obtaining an event log which can be either generated from scratch or read-in
 
 # log = ev.event_log_generation() # generates a new event log
-log = event_log_import(data_path="simple_event_log.xes")  # reads the event log
+log = event_log_import(data_path="simple_event_log.feather")  # reads the event log
 logger_general.info("The available event log has the length %s", len(log))
 
+# creating the ontology in sql, skipped when it is already loaded
+bootstrap(data_path="data/")
+
 # obtaining the domain knowledge information
-knowledge = ontology.domain_knowledge_processing_partitioning(query=query)
+if DOMAIN_KNOWLEDGE_VIEW:
+    knowledge = ontology.domain_knowledge_processing_partitioning(
+        query=query_domain_knowledge, view=True
+    )
+else:
+    knowledge = ontology.domain_knowledge_processing_partitioning(
+        query=query, aggregate=True
+    )
 logger_general.info("The domain knowledge was obtained: %s", knowledge.head(3))
 
 
@@ -0,0 +1,135 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# making the func package importable when pytest runs from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from func.sql_connection import close_pool  # noqa: E402
+
+PRESENTATIONS = ["2014B", "2014J"]
+MODULES = ["AAA", "BBB"]
+
+
+@pytest.fixture(scope="session")
+def oulad_data(tmp_path_factory):
+    """Writes a small random OULAD dataset with the columns of the
+    original csv files and returns the path of its folder
+    """
+    rng = np.random.default_rng(0)
+    data_path = str(tmp_path_factory.mktemp("data")) + "/"
+
+    courses = [(m, p) for m in MODULES for p in PRESENTATIONS]
+
+    assessments = []
+    for i, (module, presentation) in enumerate(courses * 3):
+        assessments.append(
+            {
+                "code_module": module,
+                "code_presentation": presentation,
+                "id_assessment": 1000 + i,
+                "assessment_type": "TMA",
+                "date": int(rng.integers(10, 200)),
+                "weight": float(rng.choice([0.0, 25.0, 50.0])),
+            }
+        )
+    assessments = pd.DataFrame(assessments)
+
+    registration = []
+    for student in range(100, 140):
+        for module, presentation in courses:
+            if rng.random() < 0.5:
+                registration.append(
+                    {
+                        "code_module": module,
+                        "code_presentation": presentation,
+                        "id_student": student,
+                        "date_registration": int(rng.integers(-30, 0)),
+                        "date_unregistration": (
+                            float(rng.integers(1, 100)) if rng.random() < 0.3 else None
+                        ),
+                    }
+                )
+    registration = pd.DataFrame(registration)
+
+    student_assessment = []
+    for row in registration.itertuples():
+        course = assessments[
+            (assessments["code_module"] == row.code_module)
+            & (assessments["code_presentation"] == row.code_presentation)
+        ]
+        for id_assessment in course["id_assessment"]:
+            if rng.random() < 0.8:
+                student_assessment.append(
+                    {
+                        "id_assessment": id_assessment,
+                        "id_student": row.id_student,
+                        "date_submitted": int(rng.integers(0, 250)),
+                        "is_banked": 0,
+                        "score": (
+                            float(rng.integers(0, 101)) if rng.random() < 0.9 else None
+                        ),
+                    }
+                )
+    student_assessment = pd.DataFrame(student_assessment)
+
+    vle = []
+    for i, (module, presentation) in enumerate(courses * 4):
+        vle.append(
+            {
+                "id_site": 500 + i,
+                "code_module": module,
+                "code_presentation": presentation,
+                "activity_type": str(rng.choice(["quiz", "resource", "forumng"])),
+                "week_from": None,
+                "week_to": None,
+            }
+        )
+    vle = pd.DataFrame(vle)
+
+    student_vle = []
+    for row in registration.itertuples():
+        sites = vle[
+            (vle["code_module"] == row.code_module)
+            & (vle["code_presentation"] == row.code_presentation)
+        ]["id_site"].to_numpy()
+        for _ in range(int(rng.integers(0, 6))):
+            student_vle.append(
+                {
+                    "code_module": row.code_module,
+                    "code_presentation": row.code_presentation,
+                    "id_student": row.id_student,
+                    "id_site": int(rng.choice(sites)),
+                    "date": int(rng.integers(-10, 250)),
+                    "sum_click": int(rng.integers(1, 10)),
+                }
+            )
+    student_vle = pd.DataFrame(student_vle)
+
+    assessments.to_csv(data_path + "assessments.csv", index=False)
+    registration.to_csv(data_path + "studentRegistration.csv", index=False)
+    student_assessment.to_csv(data_path + "studentAssessment.csv", index=False)
+    vle.to_csv(data_path + "vle.csv", index=False)
+    student_vle.to_csv(data_path + "studentVle.csv", index=False)
+
+    return data_path
+
+
+@pytest.fixture
+def embedded_backend(oulad_data, monkeypatch, tmp_path):
+    """Points the connection settings to an in-memory DuckDB
+    database loaded from the random dataset
+    """
+    pytest.importorskip("duckdb")
+
+    monkeypatch.setenv("OULAD_DB_CONFIG", str(tmp_path / "missing.ini"))
+    monkeypatch.setenv("OULAD_DB_BACKEND", "duckdb")
+    monkeypatch.setenv("OULAD_DB_DATA_PATH", oulad_data)
+    monkeypatch.setenv("OULAD_DB_DUCKDB_DATABASE", ":memory:")
+
+    close_pool()
+    yield oulad_data
+    close_pool()
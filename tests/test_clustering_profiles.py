@@ -0,0 +1,152 @@
+import collections
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import func.clustering_profiles as profiles
+from func.event_log import event_log_extraction
+
+KEYS = ["id_student", "code_module", "code_presentation"]
+
+
+@pytest.fixture(scope="module")
+def log_pd(oulad_data):
+    return event_log_extraction(
+        keys=KEYS, data_path=oulad_data, presentations=["2014B", "2014J"]
+    )
+
+
+@pytest.fixture(scope="module")
+def vle(oulad_data):
+    vle = pd.read_csv(oulad_data + "vle.csv")
+    return vle.rename(columns={"id_site": "site"})[["site", "activity_type"]]
+
+
+def counter_profile(groups, column):
+    """The per-case list and Counter profiles the count profiles replace"""
+    groups = groups.reset_index()
+    profile = pd.DataFrame(list(groups[column].apply(collections.Counter)))
+    profile["case:concept:name"] = groups["case:concept:name"]
+    return profile.fillna(0)
+
+
+def assert_same_counts(result, expected):
+    expected = expected[list(result.columns)]
+    pd.testing.assert_frame_equal(
+        result.astype({c: float for c in result.columns[:-1]}),
+        expected.astype({c: float for c in expected.columns[:-1]}),
+        check_dtype=False,
+    )
+
+
+def test_profile_activity_matches_counters(log_pd):
+    groups = log_pd.groupby("case:concept:name")["concept:name"].apply(list)
+    expected = counter_profile(groups, "concept:name")
+
+    result = profiles.profile_activity(log_pd)
+
+    assert list(result.columns[:-1]) == sorted(result.columns[:-1])
+    assert result.columns[-1] == "case:concept:name"
+    assert_same_counts(result, expected)
+
+
+def test_profile_vle_matches_merge(log_pd, vle):
+    merged = log_pd[["case:concept:name", "site"]].merge(vle, on="site")
+    groups = merged.groupby("case:concept:name")["activity_type"].apply(list)
+    expected = counter_profile(groups, "activity_type")
+
+    result = profiles.profile_vle(vle, log_pd)
+
+    assert_same_counts(result, expected)
+
+
+def test_profile_performance_matches_lists(log_pd):
+    groups = log_pd.groupby("case:concept:name")["time:timestamp"].apply(list)
+    expected = groups.reset_index()
+    expected["duration"] = expected["time:timestamp"].apply(
+        lambda x: (x[-1] - x[0]).days
+    )
+    expected["events"] = expected["time:timestamp"].apply(len)
+    expected["mean_gap"] = expected["time:timestamp"].apply(
+        lambda x: (x[-1] - x[0]).total_seconds() / 86400 / max(len(x) - 1, 1)
+    )
+    expected["active_days"] = expected["time:timestamp"].apply(
+        lambda x: len({t.date() for t in x})
+    )
+    expected = expected.drop("time:timestamp", axis=1)
+
+    result = profiles.profile_performance(
+        log_pd, features=profiles.PERFORMANCE_FEATURES
+    )
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_profile_performance_ignores_event_order(log_pd):
+    shuffled = log_pd.sample(frac=1, random_state=0)
+
+    pd.testing.assert_frame_equal(
+        profiles.profile_performance(shuffled), profiles.profile_performance(log_pd)
+    )
+
+
+def test_sparse_profiles_match_dense(log_pd, vle):
+    for dense, sparse in [
+        (profiles.profile_activity(log_pd), profiles.profile_activity(log_pd, True)),
+        (profiles.profile_vle(vle, log_pd), profiles.profile_vle(vle, log_pd, True)),
+    ]:
+        counts = sparse.drop("case:concept:name", axis=1).sparse.to_dense()
+        counts["case:concept:name"] = sparse["case:concept:name"]
+
+        pd.testing.assert_frame_equal(counts, dense, check_dtype=False)
+
+
+def test_profile_log_matches_single_profiles(log_pd, vle):
+    result = profiles.profile_log(log_pd, vle=vle)
+
+    cases = result["activity"]["case:concept:name"]
+    for profile in result.values():
+        assert profile["case:concept:name"].tolist() == cases.tolist()
+
+    pd.testing.assert_frame_equal(result["activity"], profiles.profile_activity(log_pd))
+    pd.testing.assert_frame_equal(
+        result["performance"], profiles.profile_performance(log_pd)
+    )
+
+    # the standalone vle profile only has the cases with interactions
+    expected = profiles.profile_vle(vle, log_pd).set_index("case:concept:name")
+    expected = expected.reindex(cases, fill_value=0).reset_index()
+    pd.testing.assert_frame_equal(
+        result["vle"],
+        expected[list(result["vle"].columns)],
+        check_dtype=False,
+    )
+
+
+def test_merge_sparse_matches_dense_merge(log_pd, vle):
+    kmeans = pytest.importorskip("func.kmeans")
+
+    activity = profiles.profile_activity(log_pd, sparse=True)
+    performance = profiles.profile_performance(log_pd)
+    vle_profile = profiles.profile_vle(vle, log_pd, sparse=True)
+    # a profile that misses some cases, as the grades do
+    grades = performance[["case:concept:name"]].iloc[::2].copy()
+    grades["score"] = np.arange(len(grades), dtype=float)
+
+    data, X = kmeans.merge_sparse([activity, performance, grades, vle_profile])
+
+    expected = reduce(
+        lambda left, right: pd.merge(left, right, on=["case:concept:name"], how="left"),
+        [
+            profiles.profile_activity(log_pd),
+            performance,
+            grades,
+            profiles.profile_vle(vle, log_pd),
+        ],
+    ).fillna(0)
+    expected_X = expected.drop("case:concept:name", axis=1).to_numpy(dtype=float)
+
+    np.testing.assert_array_equal(X.toarray(), expected_X)
+    assert data["case:concept:name"].tolist() == expected["case:concept:name"].tolist()
@@ -0,0 +1,225 @@
+import shutil
+
+import pandas as pd
+
+import func.event_log
+import func.sql_preproc
+from func.event_log import (
+    case_id,
+    case_ids,
+    event_log_extraction,
+    event_log_generation,
+    event_log_import,
+    registration_events,
+    student_registration,
+    student_unregistration,
+    time_conversion,
+    time_conversions,
+    vle_interaction,
+)
+
+KEYS = ["id_student", "code_module", "code_presentation"]
+
+
+def test_case_ids_match_case_id():
+    data = pd.DataFrame(
+        {
+            "id_student": [11, 2405, 11],
+            "code_module": ["AAA", "BBB", "AAA"],
+            "code_presentation": ["2014J", "2013B", "2014B"],
+        },
+        index=[5, 3, 9],
+    )
+
+    expected = [case_id(row, KEYS) for _, row in data.iterrows()]
+
+    assert case_ids(data, KEYS).tolist() == expected
+    assert case_ids(data, KEYS).index.equals(data.index)
+
+
+def test_time_conversions_match_time_conversion():
+    dates = pd.Series([0, 15, -7, 230, 3])
+    codes = pd.Series(["2014J", "2014B", "2013J", "2014J", "2013B"])
+
+    expected = [time_conversion(d, c) for d, c in zip(dates, codes)]
+
+    assert time_conversions(dates, codes).tolist() == expected
+
+
+def test_preproc_time_conversions_match_time_conversion():
+    # dates that were already converted are kept as they are
+    dates = pd.Series([12, "01-02-2014", -3])
+    codes = pd.Series(["2014B", "2014B", "2013J"])
+
+    expected = [func.sql_preproc.time_conversion(d, c) for d, c in zip(dates, codes)]
+
+    assert func.sql_preproc.time_conversions(dates, codes).tolist() == expected
+
+
+def test_new_presentation_keeps_existing_shards(oulad_data, tmp_path, monkeypatch):
+    shutil.copytree(oulad_data, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+
+    log_pd = event_log_generation(presentations=["2014B", "2014J"], output=None)
+    shards = sorted(p.name for p in (tmp_path / "event_log_shards").iterdir())
+
+    # unchanged files are not parsed again
+    scans = []
+    digests = func.event_log.presentation_digests
+
+    def scanned_digests(data_path, presentations, files):
+        scans.append(files)
+        return digests(data_path, presentations, files)
+
+    monkeypatch.setattr(func.event_log, "presentation_digests", scanned_digests)
+    event_log_generation(presentations=["2014B", "2014J"], output=None)
+    assert scans == []
+
+    # rows of another presentation do not change the existing shards
+    with open("data/studentVle.csv", "a") as file:
+        file.write("AAA,2015B,100,500,3,1\n")
+    reused = event_log_generation(presentations=["2014B", "2014J"], output=None)
+
+    assert scans == [["studentVle.csv"]]
+    assert sorted(p.name for p in (tmp_path / "event_log_shards").iterdir()) == shards
+    pd.testing.assert_frame_equal(reused, log_pd)
+
+    fresh = event_log_generation(
+        presentations=["2014B", "2014J"], output=None, shard_dir=None
+    )
+    pd.testing.assert_frame_equal(fresh, log_pd)
+
+
+def test_event_log_import_reads_columnar_files(oulad_data, tmp_path, monkeypatch):
+    shutil.copytree(oulad_data, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+
+    log_pd = event_log_generation(
+        presentations=["2014B", "2014J"], output="simple_event_log.feather"
+    )
+
+    for data_path in ["simple_event_log.feather", "event_log_shards"]:
+        log, read = event_log_import(data_path=data_path, pandas=True)
+
+        pd.testing.assert_frame_equal(read, log_pd)
+        assert len(log) == log_pd["case:concept:name"].nunique()
+        assert sum(len(trace) for trace in log) == len(log_pd)
+
+
+def test_changed_rows_rebuild_their_shard(oulad_data, tmp_path, monkeypatch):
+    shutil.copytree(oulad_data, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+
+    event_log_generation(presentations=["2014B", "2014J"], output=None)
+    shards = {
+        p.name: p.stat().st_mtime_ns
+        for p in tmp_path.glob("event_log_shards/*.feather")
+    }
+
+    vle = pd.read_csv("data/studentVle.csv")
+    vle.loc[vle["code_presentation"] == "2014J", "date"] += 1
+    vle.to_csv("data/studentVle.csv", index=False)
+    log_pd = event_log_generation(presentations=["2014B", "2014J"], output=None)
+
+    rebuilt = {
+        p.name: p.stat().st_mtime_ns
+        for p in tmp_path.glob("event_log_shards/*.feather")
+    }
+    assert rebuilt.keys() == shards.keys()
+    assert [name for name in shards if rebuilt[name] != shards[name]] == [
+        name for name in shards if name.startswith("2014J")
+    ]
+
+    fresh = event_log_generation(
+        presentations=["2014B", "2014J"], output=None, shard_dir=None
+    )
+    pd.testing.assert_frame_equal(log_pd, fresh)
+
+
+def test_changed_inputs_invalidate_the_cache(oulad_data, tmp_path, monkeypatch):
+    shutil.copytree(oulad_data, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+
+    event_log_generation(presentations=["2014B", "2014J"], output=None)
+    shards = {
+        p.name: p.stat().st_mtime_ns
+        for p in tmp_path.glob("event_log_shards/*.feather")
+    }
+
+    # a submission of a 2014B assessment only invalidates the 2014B shard
+    assessments = pd.read_csv("data/assessments.csv")
+    submissions = pd.read_csv("data/studentAssessment.csv")
+    codes = submissions["id_assessment"].map(
+        assessments.set_index("id_assessment")["code_presentation"]
+    )
+    submissions.loc[(codes == "2014B").idxmax(), "date_submitted"] += 1
+    submissions.to_csv("data/studentAssessment.csv", index=False)
+
+    log_pd = event_log_generation(presentations=["2014B", "2014J"], output=None)
+
+    rebuilt = {
+        p.name: p.stat().st_mtime_ns
+        for p in tmp_path.glob("event_log_shards/*.feather")
+    }
+    assert [name for name in shards if rebuilt[name] != shards[name]] == [
+        name for name in shards if name.startswith("2014B")
+    ]
+
+    fresh = event_log_generation(
+        presentations=["2014B", "2014J"], output=None, shard_dir=None
+    )
+    pd.testing.assert_frame_equal(log_pd, fresh)
+
+    # a change of the extraction code invalidates every shard
+    code = tmp_path / "code.py"
+    code.write_text("# version 2\n")
+    monkeypatch.setattr(
+        func.event_log,
+        "EXTRACTION_MODULES",
+        func.event_log.EXTRACTION_MODULES + [str(code)],
+    )
+    event_log_generation(presentations=["2014B", "2014J"], output=None)
+
+    rebuilt = sorted(p.name for p in tmp_path.glob("event_log_shards/*.feather"))
+    assert len(rebuilt) == len(shards)
+    assert set(rebuilt).isdisjoint(shards)
+
+
+def test_registration_events_match_separate_extractors(oulad_data):
+    presentations = ["2014B", "2014J"]
+
+    result = registration_events(KEYS, oulad_data, presentations=presentations)
+    expected = pd.concat(
+        [
+            student_registration(KEYS, oulad_data, presentations=presentations),
+            student_unregistration(KEYS, oulad_data, presentations=presentations),
+        ],
+        ignore_index=True,
+    )
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_vle_chunks_match_full_read(oulad_data):
+    presentations = ["2014B", "2014J"]
+
+    chunked = vle_interaction(
+        KEYS, oulad_data, chunksize=7, presentations=presentations
+    )
+    full = vle_interaction(KEYS, oulad_data, presentations=presentations)
+
+    # the chunks are read with compact dtypes
+    pd.testing.assert_frame_equal(chunked, full, check_dtype=False)
+
+    empty = vle_interaction(KEYS, oulad_data, chunksize=7, presentations=["2099J"])
+    assert empty.empty
+    assert list(empty.columns) == list(full.columns)
+
+
+def test_pooled_extraction_matches_sequential(oulad_data):
+    arguments = {"keys": KEYS, "data_path": oulad_data, "presentations": ["2014J"]}
+
+    pooled = event_log_extraction(workers=2, **arguments)
+    sequential = event_log_extraction(**arguments)
+
+    pd.testing.assert_frame_equal(pooled, sequential)
@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+import func.ontology_processing as ontology
+from func.sql_load import query_domain_knowledge
+
+query_grades = """
+
+SELECT
+    assessments.code_module,
+    assessments.code_presentation,
+    student_assessment.id_student,
+    assessments.id_assessment,
+    assessments.weight,
+    student_assessment.score,
+    registration.date_unregistration as still_enrolled
+
+FROM student_assessment
+
+JOIN assessments ON student_assessment.id_assessment = assessments.id_assessment
+
+LEFT JOIN registration ON student_assessment.id_student = registration.id_student
+    AND assessments.code_module = registration.code_module
+    AND assessments.code_presentation = registration.code_presentation
+
+WHERE assessments.code_presentation = '2014J' OR assessments.code_presentation = '2014B'
+
+"""
+
+query_vle = "SELECT id_site, activity_type FROM vle;"
+
+
+@pytest.fixture
+def knowledge(embedded_backend):
+    """The domain knowledge computed in pandas from every grade"""
+    return ontology.domain_knowledge_processing_partitioning(query_grades)
+
+
+def assert_same_knowledge(result, expected):
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_aggregate_matches_pandas(knowledge):
+    result = ontology.domain_knowledge_processing_partitioning(
+        query_grades, aggregate=True
+    )
+
+    assert knowledge["still_enrolled"].nunique() == 2
+    assert_same_knowledge(result, knowledge)
+
+
+def test_view_matches_pandas(knowledge):
+    result = ontology.domain_knowledge_processing_partitioning(
+        query_domain_knowledge, view=True
+    )
+
+    assert_same_knowledge(result, knowledge)
+
+
+@pytest.mark.parametrize("aggregate", [False, True])
+def test_batches_match_single_fetch(knowledge, aggregate):
+    result = ontology.domain_knowledge_processing_partitioning(
+        query_grades, batch_size=7, aggregate=aggregate
+    )
+
+    assert_same_knowledge(result, knowledge)
+
+
+def test_clustering_queries_match_sequential_reads(embedded_backend):
+    grades, vle = ontology.domain_knowledge_clustering(query_grades, query_vle)
+
+    expected_grades = pd.DataFrame(
+        ontology.ontology_import(query_grades), columns=ontology.GRADE_COLUMNS
+    )
+    expected_grades["id_assessment"] = pd.to_numeric(expected_grades["id_assessment"])
+    expected_vle = pd.DataFrame(
+        ontology.ontology_import(query_vle), columns=ontology.VLE_COLUMNS
+    )
+
+    # the join gives no row order, so the rows get sorted first
+    for result, expected in [(grades, expected_grades), (vle, expected_vle)]:
+        columns = list(expected.columns)
+        pd.testing.assert_frame_equal(
+            result.sort_values(columns, ignore_index=True),
+            expected.sort_values(columns, ignore_index=True),
+        )
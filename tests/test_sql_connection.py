@@ -0,0 +1,101 @@
+import uuid
+
+import psycopg2
+import pytest
+
+from func.sql_connection import (
+    close_pool,
+    connection,
+    connection_pool,
+    database_config,
+    is_embedded,
+)
+
+
+def test_database_config_overrides(tmp_path, monkeypatch):
+    config = tmp_path / "database.ini"
+    config.write_text("[postgresql]\nport = 5432\nuser = oulad\n")
+
+    monkeypatch.setenv("OULAD_DB_CONFIG", str(config))
+    monkeypatch.setenv("OULAD_DB_USER", "tester")
+
+    settings = database_config()
+
+    assert settings["port"] == "5432"
+    assert settings["user"] == "tester"
+    assert settings["database"] == "OULAD"
+
+
+@pytest.fixture
+def postgres_table():
+    """Creates a table on the PostgreSQL server of the settings
+    (e.g. a throwaway instance set through OULAD_DB_*), skipping
+    the test when no server can be reached
+    """
+    close_pool()
+    try:
+        connection_pool()
+    except psycopg2.OperationalError as error:
+        pytest.skip("no PostgreSQL server available: %s" % error)
+
+    table = "pool_test_" + uuid.uuid4().hex
+    with connection(autocommit=True) as conn:
+        conn.cursor().execute("CREATE TABLE %s (value int);" % table)
+
+    yield table
+
+    with connection(autocommit=True) as conn:
+        conn.cursor().execute("DROP TABLE %s;" % table)
+    close_pool()
+
+
+def table_values(table):
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT value FROM %s ORDER BY value;" % table)
+            return [row[0] for row in cursor.fetchall()]
+
+
+def test_connection_commits(postgres_table):
+    with connection() as conn:
+        conn.cursor().execute("INSERT INTO %s VALUES (1);" % postgres_table)
+
+    assert table_values(postgres_table) == [1]
+
+
+def test_connection_rolls_back_on_error(postgres_table):
+    with pytest.raises(ValueError):
+        with connection() as conn:
+            conn.cursor().execute("INSERT INTO %s VALUES (1);" % postgres_table)
+            raise ValueError("failing load")
+
+    assert table_values(postgres_table) == []
+
+
+def test_connection_is_usable_after_a_failed_statement(postgres_table):
+    with pytest.raises(psycopg2.Error):
+        with connection() as conn:
+            conn.cursor().execute("SELECT * FROM %s_missing;" % postgres_table)
+
+    # the connection went back to the pool without an aborted transaction
+    with connection() as conn:
+        conn.cursor().execute("INSERT INTO %s VALUES (2);" % postgres_table)
+
+    assert table_values(postgres_table) == [2]
+
+
+def test_autocommit_keeps_statements(postgres_table):
+    with pytest.raises(ValueError):
+        with connection(autocommit=True) as conn:
+            conn.cursor().execute("INSERT INTO %s VALUES (3);" % postgres_table)
+            raise ValueError("failing load")
+
+    assert table_values(postgres_table) == [3]
+
+
+def test_embedded_connection(embedded_backend):
+    with connection() as conn:
+        assert is_embedded(conn)
+        rows = conn.execute("SELECT count(*) FROM registration;").fetchone()[0]
+
+    assert rows > 0
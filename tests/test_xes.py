@@ -0,0 +1,50 @@
+import pandas as pd
+import pm4py
+import pytest
+
+from func.event_log import event_log_extraction
+from func.xes import xes_export, xes_import
+
+KEYS = ["id_student", "code_module", "code_presentation"]
+
+COLUMNS = ["case:concept:name", "time:timestamp", "concept:name", "assessment", "site"]
+
+
+@pytest.fixture(scope="module")
+def log_pd(oulad_data):
+    return event_log_extraction(
+        keys=KEYS, data_path=oulad_data, presentations=["2014B", "2014J"]
+    )
+
+
+def events(event_log):
+    """The events of an event log in a fixed order, so the logs of
+    different importers can be compared
+    """
+    event_log = event_log[COLUMNS].copy()
+    event_log["time:timestamp"] = event_log["time:timestamp"].astype(
+        "datetime64[ns, UTC]"
+    )
+    for column in ["case:concept:name", "concept:name"]:
+        event_log[column] = event_log[column].astype(str)
+
+    return event_log.sort_values(COLUMNS, ignore_index=True)
+
+
+@pytest.mark.parametrize("file", ["event_log.xes", "event_log.xes.gz"])
+def test_xes_export_matches_pm4py_importer(log_pd, tmp_path, file):
+    xes_export(log_pd, str(tmp_path / file))
+
+    pd.testing.assert_frame_equal(
+        events(pm4py.read_xes(str(tmp_path / file))), events(log_pd)
+    )
+
+
+@pytest.mark.parametrize("file", ["event_log.xes", "event_log.xes.gz"])
+def test_xes_import_matches_pm4py_importer(log_pd, tmp_path, file):
+    pm4py.write_xes(log_pd, str(tmp_path / file))
+
+    result = events(xes_import(str(tmp_path / file)))
+
+    pd.testing.assert_frame_equal(result, events(pm4py.read_xes(str(tmp_path / file))))
+    pd.testing.assert_frame_equal(result, events(log_pd))